@@ -0,0 +1,55 @@
+"""Categorize synthetic file names with the old linear scan and the extension index.
+
+Usage:
+    python benchmarks/bench_categorize.py [--count 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from categories import FILE_CATEGORIES, CategoryIndex  # noqa: E402
+
+
+def legacy_get_category(filename):
+    """The pre-index implementation: a linear `in` test per category."""
+    ext = os.path.splitext(filename)[1].lower()
+    for category, extensions in FILE_CATEGORIES.items():
+        if ext in extensions:
+            return category
+    return 'Other'
+
+
+def make_names(count, seed=0):
+    rng = random.Random(seed)
+    extensions = [ext for exts in FILE_CATEGORIES.values() for ext in exts]
+    extensions += ['.dat', '.bin', '.log', '', '.JPG', '.Tar.Gz']
+    return [f"file_{i}{rng.choice(extensions)}" for i in range(count)]
+
+
+def timed(func, names):
+    start = time.perf_counter()
+    for name in names:
+        func(name)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    names = make_names(args.count)
+    index = CategoryIndex(FILE_CATEGORIES)
+    legacy = timed(legacy_get_category, names)
+    indexed = timed(index.category, names)
+    print(f"{'names':>10} {'legacy (s)':>12} {'index (s)':>12} {'speedup':>8}")
+    print(f"{args.count:>10} {legacy:>12.3f} {indexed:>12.3f} {legacy / indexed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare the os.scandir scanner with the old listdir + stat + isdir path.
+
+Usage:
+    python benchmarks/bench_scan.py [--sizes 10000 100000 1000000] [--root DIR]
+
+Synthetic flat trees are created under --root (a temporary directory by
+default) and reused between runs, so the 1M case only pays setup once.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scanner import scan_directory  # noqa: E402
+
+EXTENSIONS = ['.jpg', '.pdf', '.txt', '.mp3', '.py', '.zip', '.dat']
+
+
+def legacy_list_files(directory):
+    """The pre-scanner implementation: listdir, then stat and isdir per entry."""
+    items = []
+    for item in os.listdir(directory):
+        full_path = os.path.join(directory, item)
+        try:
+            stats = os.stat(full_path)
+            items.append({
+                'name': item,
+                'path': full_path,
+                'size': stats.st_size,
+                'modified': stats.st_mtime,
+                'is_dir': os.path.isdir(full_path)
+            })
+        except OSError:
+            pass
+    return items
+
+
+def make_tree(root, count):
+    """Create (or reuse) a flat directory with `count` entries, 1 in 50 a folder."""
+    target = os.path.join(root, f"flat_{count}")
+    marker = os.path.join(target, ".complete")
+    if os.path.exists(marker):
+        return target
+    os.makedirs(target, exist_ok=True)
+    for i in range(count):
+        if i % 50 == 0:
+            os.makedirs(os.path.join(target, f"dir_{i:07d}"), exist_ok=True)
+        else:
+            name = f"file_{i:07d}{EXTENSIONS[i % len(EXTENSIONS)]}"
+            with open(os.path.join(target, name), 'wb') as f:
+                f.write(b'x' * (i % 7))
+    open(marker, 'w').close()
+    return target
+
+
+def best_of(func, directory, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(directory)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--root', default=None, help="where to build the synthetic trees")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    root = args.root or os.path.join(tempfile.gettempdir(), "file_organizer_bench")
+    os.makedirs(root, exist_ok=True)
+
+    print(f"{'entries':>10} {'legacy (s)':>12} {'scandir (s)':>12} {'speedup':>8}")
+    for count in args.sizes:
+        directory = make_tree(root, count)
+        legacy = best_of(legacy_list_files, directory, args.repeat)
+        scanned = best_of(scan_directory, directory, args.repeat)
+        print(f"{count:>10} {legacy:>12.3f} {scanned:>12.3f} {legacy / scanned:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
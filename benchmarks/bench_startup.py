@@ -0,0 +1,48 @@
+"""Measure cold-start time of the command-line interface.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 20]
+
+Each run starts a fresh interpreter, so this includes interpreter startup;
+a bare `python -c pass` is timed as the floor to compare against.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def time_command(command, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=ROOT)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), min(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as empty:
+        commands = {
+            'python -c pass': [sys.executable, '-c', 'pass'],
+            'cli --help': [sys.executable, 'organizer_cli.py', '--help'],
+            'cli stats': [sys.executable, 'organizer_cli.py', 'stats', empty],
+            'cli list': [sys.executable, 'organizer_cli.py', 'list', empty],
+        }
+        print(f"{'command':<16} {'median (ms)':>12} {'min (ms)':>10}")
+        for label, command in commands.items():
+            median, best = time_command(command, args.runs)
+            print(f"{label:<16} {median * 1000:>12.1f} {best * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
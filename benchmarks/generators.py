@@ -0,0 +1,129 @@
+"""Deterministic synthetic directory trees for the benchmark suite.
+
+Every generator takes a root, a file count and a seed and always produces
+the same names, sizes, contents and modification times, so results from
+different machines and commits describe the same workload.
+"""
+import os
+import random
+import shutil
+from typing import Callable, Dict
+
+from dedupe import HASH_BLOCK
+
+# Mix of known categories, a compound extension, odd casing and unknown types
+EXTENSIONS = ['.jpg', '.png', '.pdf', '.docx', '.txt', '.mp3', '.mp4', '.zip', '.tar.gz',
+              '.py', '.JPG', '.dat', '']
+BASE_MTIME = 1_600_000_000  # Fixed epoch so age-based logic sees the same tree every run
+MAX_SIZE = 4096
+PATTERN = bytes(range(256)) * (MAX_SIZE // 256 + 1)
+
+
+def _write(path: str, size: int, salt: int, mtime: int):
+    with open(path, 'wb') as f:
+        f.write(PATTERN[salt % 256:salt % 256 + size])
+    os.utime(path, (mtime, mtime))
+
+
+def _fresh(root: str, name: str) -> str:
+    target = os.path.join(root, name)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.makedirs(target)
+    return target
+
+
+def make_flat(root: str, count: int, seed: int = 0) -> str:
+    """One directory with `count` entries, 1 in 50 of them an empty folder."""
+    rng = random.Random(seed)
+    target = _fresh(root, "flat")
+    for i in range(count):
+        if i % 50 == 0:
+            os.mkdir(os.path.join(target, f"dir_{i:07d}"))
+            continue
+        name = f"file_{i:07d}{rng.choice(EXTENSIONS)}"
+        _write(os.path.join(target, name), rng.randrange(MAX_SIZE), i, BASE_MTIME + rng.randrange(10**8))
+    return target
+
+
+def make_deep(root: str, count: int, seed: int = 0, fanout: int = 4, per_dir: int = 20) -> str:
+    """A tree `fanout` directories wide with `per_dir` files in every directory."""
+    rng = random.Random(seed)
+    target = _fresh(root, "deep")
+    queue = [target]
+    written = 0
+    while written < count:
+        directory = queue.pop(0)
+        for _ in range(min(per_dir, count - written)):
+            name = f"f{written:07d}{rng.choice(EXTENSIONS)}"
+            _write(os.path.join(directory, name), rng.randrange(MAX_SIZE), written,
+                   BASE_MTIME + rng.randrange(10**8))
+            written += 1
+        for j in range(fanout):
+            child = os.path.join(directory, f"d{j}")
+            os.mkdir(child)
+            queue.append(child)
+    return target
+
+
+def make_duplicates(root: str, count: int, seed: int = 0) -> str:
+    """Files where about half are copies of another, plus same-size decoys.
+
+    Sizes straddle the partial-hash block so every stage of the duplicate
+    finder gets work: equal-size non-duplicates, decoys that match a large
+    original except for one byte between the first and last HASH_BLOCK
+    (so only the full hash tells them apart), and small files hashed in
+    one read.
+    """
+    rng = random.Random(seed)
+    target = _fresh(root, "dupes")
+    originals = max(1, count // 2)
+    contents = []
+    for i in range(originals):
+        size = rng.choice([512, 4096, 200_000])
+        contents.append((size, i))
+    large = [i for i, (size, _) in enumerate(contents) if size > 2 * HASH_BLOCK]
+    for i in range(count):
+        middle = None
+        if i < originals:
+            size, salt = contents[i]
+        elif i % 5 == 0 and large:
+            # A copy of a large original with one byte flipped outside the partially hashed ends
+            size, salt = contents[rng.choice(large)]
+            middle = rng.randrange(HASH_BLOCK, size - HASH_BLOCK)
+        else:
+            size, salt = contents[rng.randrange(originals)]
+        block = PATTERN[salt % 256:salt % 256 + 256]
+        data = bytearray((block * (size // 256 + 1))[:size])
+        if middle is not None:
+            data[middle] ^= 0xFF
+        path = os.path.join(target, f"copy_{i:07d}{rng.choice(EXTENSIONS)}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        os.utime(path, (BASE_MTIME, BASE_MTIME))
+    return target
+
+
+def make_long_names(root: str, count: int, seed: int = 0) -> str:
+    """Files with names close to the 255-byte limit, some of them non-ASCII."""
+    rng = random.Random(seed)
+    target = _fresh(root, "long_names")
+    alphabet = "abcdefghijklmnopqrstuvwxyz0123456789 _-"
+    for i in range(count):
+        ext = rng.choice(EXTENSIONS)
+        stem = f"{i:07d}_" + "".join(rng.choice(alphabet) for _ in range(rng.randrange(150, 230)))
+        if i % 4 == 0:
+            stem += "é" * 8
+        # Trim on a byte budget without splitting a multi-byte character
+        stem = stem.encode('utf-8')[:255 - len(ext)].decode('utf-8', 'ignore')
+        name = stem + ext
+        _write(os.path.join(target, name), rng.randrange(MAX_SIZE), i, BASE_MTIME + rng.randrange(10**8))
+    return target
+
+
+TREES: Dict[str, Callable[[str, int, int], str]] = {
+    'flat': make_flat,
+    'deep': make_deep,
+    'dupes': make_duplicates,
+    'long_names': make_long_names,
+}
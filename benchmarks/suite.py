@@ -0,0 +1,203 @@
+"""Headless benchmark suite with baseline comparison.
+
+Times the operations behind the GUI -- list_files (scanning), sort_files
+(every sort method on a fresh model), get_category, organize_files and
+find_duplicates -- on deterministic synthetic trees (see generators.py),
+on tmpfs and on disk.
+
+Usage:
+    python benchmarks/suite.py --files 20000 --output results.json
+    python benchmarks/suite.py --baseline baseline.json --threshold 0.15
+    python benchmarks/suite.py --trees flat deep --fs disk --repeat 3 --save-baseline baseline.json
+
+Results are JSON keyed by "<tree>@<fs>/<operation>". With --baseline, an
+operation whose median time grew by more than --threshold (relative) and
+--min-delta (absolute seconds) is reported as a regression and the exit
+status is 1. Timings are warm-cache: page cache is not dropped between runs.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from categories import get_category  # noqa: E402
+from generators import TREES  # noqa: E402
+from listing_cache import default_cache_dir  # noqa: E402
+from organizer_core import SORT_METHODS, FileModel, find_duplicates, organize  # noqa: E402
+from scanner import scan_directory  # noqa: E402
+from tree_walk import walk_files  # noqa: E402
+
+TMPFS_ROOT = "/dev/shm"
+# organize_files goes last: it regenerates the tree it moves in place
+OPERATIONS = ['list_files', 'sort_files', 'get_category', 'find_duplicates', 'organize_files']
+
+
+def filesystems(names, disk_root):
+    roots = {}
+    if 'tmpfs' in names:
+        if os.path.isdir(TMPFS_ROOT) and os.access(TMPFS_ROOT, os.W_OK):
+            roots['tmpfs'] = TMPFS_ROOT
+        else:
+            print(f"Skipping tmpfs: {TMPFS_ROOT} is not available", file=sys.stderr)
+    if 'disk' in names:
+        os.makedirs(disk_root, exist_ok=True)
+        roots['disk'] = disk_root
+    return roots
+
+
+def list_tree(tree, path):
+    return walk_files(path) if tree == 'deep' else scan_directory(path)
+
+
+def timed(func, repeat, setup=None):
+    """Run `func(setup())` `repeat` times; only func is timed."""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        gc.collect()
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_tree(tree, fs, root, files, seed, repeat, operations):
+    """Benchmark every requested operation on one tree; returns {key: result}."""
+    work = tempfile.mkdtemp(prefix="bench-", dir=root)
+    results = {}
+    try:
+        generate = TREES[tree]
+        path = generate(work, files, seed)
+        records = list_tree(tree, path)
+        items = len(records)
+
+        cases = {
+            'list_files': (lambda _: list_tree(tree, path), None),
+            'sort_files': (lambda _: [FileModel(records).sorted(m) for m in SORT_METHODS], None),
+            'get_category': (lambda _: [get_category(r.name) for r in records], None),
+            # Organize moves files, so every run gets a freshly generated tree
+            'organize_files': (lambda p: organize(p, recursive=(tree == 'deep')),
+                               lambda: generate(work, files, seed)),
+        }
+        if tree == 'dupes':
+            cases['find_duplicates'] = (lambda _: find_duplicates(path), None)
+
+        for op in OPERATIONS:
+            if op not in operations or op not in cases:
+                continue
+            func, setup = cases[op]
+            times = timed(func, repeat, setup)
+            median = statistics.median(times)
+            results[f"{tree}@{fs}/{op}"] = {
+                'median': median, 'min': min(times), 'max': max(times), 'runs': len(times),
+                'items': items, 'items_per_second': items / median if median > 0 else 0.0,
+            }
+            print(f"{tree + '@' + fs + '/' + op:<40} {median * 1e3:>10.1f} ms  {items / median:>12,.0f} items/s",
+                  file=sys.stderr)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Return (lines, regressions) comparing medians against a baseline run."""
+    lines = [f"{'benchmark':<40} {'baseline ms':>12} {'current ms':>12} {'change':>8}"]
+    regressions = []
+    for key, current in sorted(results.items()):
+        before = baseline.get('results', {}).get(key)
+        if before is None:
+            lines.append(f"{key:<40} {'--':>12} {current['median'] * 1e3:>12.1f} {'new':>8}")
+            continue
+        change = current['median'] / before['median'] - 1 if before['median'] > 0 else 0.0
+        regressed = change > threshold and current['median'] - before['median'] > min_delta
+        if regressed:
+            regressions.append(key)
+        lines.append(f"{key:<40} {before['median'] * 1e3:>12.1f} {current['median'] * 1e3:>12.1f} "
+                     f"{change:>+7.1%}{'  REGRESSION' if regressed else ''}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=20000, help="files per tree (default: 20000)")
+    parser.add_argument('--trees', nargs='+', choices=list(TREES), default=list(TREES))
+    parser.add_argument('--fs', nargs='+', choices=['tmpfs', 'disk'], default=['tmpfs', 'disk'])
+    parser.add_argument('--ops', nargs='+', choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument('--disk-root', default=str(default_cache_dir() / "bench"),
+                        help="where on-disk trees are generated (default: the user cache dir)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results as JSON (default: stdout)")
+    parser.add_argument('--save-baseline', metavar='FILE', help="also write the results as a baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against a saved run")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="relative slowdown counted as a regression (default: 0.15)")
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help="ignore slowdowns smaller than this many seconds (default: 0.005)")
+    args = parser.parse_args(argv)
+
+    # Keep organize journals out of the user's real cache
+    journal_home = tempfile.mkdtemp(prefix="bench-cache-")
+    os.environ['XDG_CACHE_HOME'] = journal_home
+    os.environ['LOCALAPPDATA'] = journal_home
+
+    run = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'files': args.files, 'repeat': args.repeat, 'seed': args.seed,
+        },
+        'results': {},
+    }
+    try:
+        for fs, root in filesystems(args.fs, args.disk_root).items():
+            for tree in args.trees:
+                run['results'].update(run_tree(tree, fs, root, args.files, args.seed, args.repeat, args.ops))
+    finally:
+        shutil.rmtree(journal_home, ignore_errors=True)
+
+    text = json.dumps(run, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(text + "\n")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if any(baseline.get('meta', {}).get(k) != run['meta'][k] for k in ('files', 'seed')):
+            print("Warning: baseline was recorded with different --files/--seed", file=sys.stderr)
+        lines, regressions = compare(run['results'], baseline, args.threshold, args.min_delta)
+        print("\n".join(lines), file=sys.stderr)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
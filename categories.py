@@ -0,0 +1,139 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# File type categories
+FILE_CATEGORIES = {
+    'Images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp'],
+    'Documents': ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.xls', '.xlsx', '.ppt', '.pptx'],
+    'Archives': ['.zip', '.rar', '.7z', '.tar', '.gz', '.tar.gz', '.tar.bz2', '.tar.xz'],
+    'Audio': ['.mp3', '.wav', '.ogg', '.flac', '.aac'],
+    'Videos': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.mkv'],
+    'Code': ['.py', '.js', '.html', '.css', '.java', '.c', '.cpp', '.h', '.json', '.xml'],
+    'Executables': ['.exe', '.msi', '.bat', '.sh']
+}
+
+OTHER = 'Other'
+
+CATEGORY_ICONS = {
+    'Images': "🖼️",
+    'Documents': "📄",
+    'Archives': "🗜️",
+    'Audio': "🎵",
+    'Videos': "🎬",
+    'Code': "</>",
+    'Executables': "⚙️",
+    OTHER: "📄",
+}
+
+
+class CategoryInfo:
+    """What the index knows about one category: its name, icon and color."""
+
+    __slots__ = ('name', 'icon', 'color')
+
+    def __init__(self, name: str, icon: str, color: Optional[Tuple[int, int, int]]):
+        self.name = name
+        self.icon = icon
+        self.color = color
+
+    def __repr__(self) -> str:
+        return f"CategoryInfo({self.name!r})"
+
+
+class CategoryIndex:
+    """Maps file extensions to categories with a single dict lookup.
+
+    Compound extensions such as ``.tar.gz`` take precedence over their last
+    component. Extensions follow os.path.splitext, so leading dots of a
+    hidden file name are not treated as an extension.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]],
+                 icons: Optional[Dict[str, str]] = None,
+                 colors: Optional[Dict[str, Tuple[int, int, int]]] = None,
+                 default_color: Optional[Tuple[int, int, int]] = None):
+        self.icons = CATEGORY_ICONS if icons is None else icons
+        self.colors = colors or {}
+        self.default_color = default_color
+        self.rebuild(categories)
+
+    def rebuild(self, categories: Dict[str, Iterable[str]]):
+        """Recompute the index from a category table."""
+        self._info: Dict[str, CategoryInfo] = {}
+        self._by_ext: Dict[str, CategoryInfo] = {}
+        self._max_dots = 1
+        self._compound_tails = set()
+        for category, extensions in categories.items():
+            info = self._make_info(category)
+            for ext in extensions:
+                ext = ext.lower()
+                # The first category listing an extension wins, as with the old linear scan
+                self._by_ext.setdefault(ext, info)
+                if ext.count('.') > 1:
+                    self._max_dots = max(self._max_dots, ext.count('.'))
+                    self._compound_tails.add(ext[ext.rfind('.'):])
+        self.other = self._make_info(OTHER)
+
+    def _make_info(self, category: str) -> CategoryInfo:
+        info = self._info.get(category)
+        if info is None:
+            icon = self.icons.get(category, self.icons.get(OTHER, ""))
+            info = CategoryInfo(category, icon, self.colors.get(category, self.default_color))
+            self._info[category] = info
+        return info
+
+    def lookup(self, filename: str) -> CategoryInfo:
+        """Return the category info for a file name."""
+        name = filename.lower()
+        dot = name.rfind('.')
+        # splitext ignores leading dots, so ".bashrc" and "..py" have no extension
+        if dot <= 0 or (name[0] == '.' and not name[:dot].lstrip('.')):
+            return self.other
+        ext = name[dot:]
+        if ext in self._compound_tails:
+            info = self._lookup_compound(name, dot)
+            if info is not None:
+                return info
+        return self._by_ext.get(ext, self.other)
+
+    def _lookup_compound(self, name: str, dot: int) -> Optional[CategoryInfo]:
+        starts = []
+        start = dot
+        for _ in range(self._max_dots - 1):
+            start = name.rfind('.', 0, start)
+            if start <= 0 or not name[:start].lstrip('.'):
+                break
+            starts.append(start)
+        # Longest compound extension first
+        for start in reversed(starts):
+            info = self._by_ext.get(name[start:])
+            if info is not None:
+                return info
+        return None
+
+    def category(self, filename: str) -> str:
+        """Return the category name for a file name."""
+        return self.lookup(filename).name
+
+    def categories(self) -> List[str]:
+        """Every category name known to the index, including Other."""
+        return list(self._info)
+
+
+_default_index = CategoryIndex(FILE_CATEGORIES)
+
+
+def category_index() -> CategoryIndex:
+    """The index shared by the GUI, CLI and organize engine."""
+    return _default_index
+
+
+def get_category(filename: str) -> str:
+    """Determine the category of a file based on its extension."""
+    return _default_index.lookup(filename).name
+
+
+def set_categories(categories: Dict[str, List[str]]):
+    """Replace the category table and rebuild the shared index."""
+    FILE_CATEGORIES.clear()
+    FILE_CATEGORIES.update(categories)
+    _default_index.rebuild(FILE_CATEGORIES)
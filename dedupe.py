@@ -0,0 +1,259 @@
+import hashlib
+import itertools
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from perf import metrics
+from scanner import FileRecord
+
+HASH_BLOCK = 64 * 1024        # Bytes hashed from each end of a file in the partial pass
+READ_BUFFER = 1024 * 1024     # Buffer for full streaming hashes
+DEFAULT_HASHERS = min(8, (os.cpu_count() or 1) + 2)
+ACTIONS = ('skip', 'hardlink', 'delete')
+_temp_ids = itertools.count()  # next() on a count is atomic, so threads never share a temp name
+
+
+class StaleFileError(OSError):
+    """A file changed after the duplicate scan, so it was left alone."""
+
+
+class DuplicateGroup:
+    """Files with identical content. paths[0] is the copy that is kept.
+
+    `stamps` maps each path to its (size, mtime_ns) from before it was
+    hashed, so dedupe() can tell when a file changed after the scan.
+    """
+
+    __slots__ = ('size', 'digest', 'paths', 'stamps')
+
+    def __init__(self, size: int, digest: str, paths: List[str], stamps: Dict[str, Tuple[int, int]]):
+        self.size = size
+        self.digest = digest
+        self.paths = paths
+        self.stamps = stamps
+
+    @property
+    def wasted_bytes(self) -> int:
+        return self.size * (len(self.paths) - 1)
+
+    def as_dict(self) -> dict:
+        return {'size': self.size, 'digest': self.digest, 'paths': self.paths}
+
+
+class DuplicateReport:
+    """Groups found by find_duplicates plus how much work it took."""
+
+    def __init__(self):
+        self.groups: List[DuplicateGroup] = []
+        self.files_considered = 0
+        self.partial_hashed = 0
+        self.full_hashed = 0
+        self.bytes_read = 0
+
+    @property
+    def wasted_bytes(self) -> int:
+        return sum(group.wasted_bytes for group in self.groups)
+
+
+class DedupeResult:
+    def __init__(self):
+        self.processed = 0
+        self.bytes_reclaimed = 0
+        self.failed: List[Tuple[str, Exception]] = []
+
+
+def find_duplicates(records: Iterable[FileRecord], min_size: int = 1,
+                    workers: int = DEFAULT_HASHERS) -> DuplicateReport:
+    """Find files with identical content among `records`.
+
+    Candidates are narrowed in three stages: equal size, then a hash of the
+    first and last HASH_BLOCK bytes, then a full streaming hash. Only files
+    that survive a stage are read in the next one, so the I/O cost follows
+    the number of real duplicate candidates rather than the directory size.
+    Hard links to the same inode count as one file.
+    """
+    report = DuplicateReport()
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def count(bytes_read: int, attr: str):
+        with lock:
+            report.bytes_read += bytes_read
+            setattr(report, attr, getattr(report, attr) + 1)
+
+    by_size: Dict[int, List[str]] = defaultdict(list)
+    for record in records:
+        if not record.is_dir and record.size >= min_size:
+            by_size[record.size].append(record.path)
+            report.files_considered += 1
+
+    candidates = []
+    stamps: Dict[str, Tuple[int, int]] = {}
+    for size, paths in by_size.items():
+        if len(paths) > 1:
+            candidates.extend((size, path) for path in _distinct_inodes(paths, stamps))
+
+    def group(size: int, digest: bytes, paths: List[str]) -> DuplicateGroup:
+        paths = sorted(paths)
+        return DuplicateGroup(size, digest.hex(), paths, {path: stamps[path] for path in paths})
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="hash") as pool:
+        # Stage 2: head and tail blocks
+        def partial(item):
+            size, path = item
+            try:
+                digest, complete = _partial_hash(path, size)
+            except OSError as e:
+                print(f"Error reading {path}: {e}")
+                return None
+            count(min(size, 2 * HASH_BLOCK), 'partial_hashed')
+            return size, path, digest, complete
+
+        by_partial: Dict[Tuple[int, bytes], List[str]] = defaultdict(list)
+        complete_keys = set()
+        for item in pool.map(partial, candidates):
+            if item is None:
+                continue
+            size, path, digest, complete = item
+            by_partial[size, digest].append(path)
+            if complete:
+                complete_keys.add((size, digest))
+
+        # Stage 3: full hash, only where the partial hash didn't cover the whole file
+        full_candidates = []
+        for key, paths in by_partial.items():
+            if len(paths) < 2:
+                continue
+            if key in complete_keys:
+                report.groups.append(group(key[0], key[1], paths))
+            else:
+                full_candidates.extend((key[0], path) for path in paths)
+
+        def full(item):
+            size, path = item
+            try:
+                digest = _full_hash(path)
+            except OSError as e:
+                print(f"Error reading {path}: {e}")
+                return None
+            count(size, 'full_hashed')
+            return size, path, digest
+
+        by_full: Dict[Tuple[int, bytes], List[str]] = defaultdict(list)
+        for item in pool.map(full, full_candidates):
+            if item is not None:
+                by_full[item[0], item[2]].append(item[1])
+
+    for (size, digest), paths in by_full.items():
+        if len(paths) > 1:
+            report.groups.append(group(size, digest, paths))
+    report.groups.sort(key=lambda group: group.wasted_bytes, reverse=True)
+    metrics.add_span("dedupe.find", start, time.perf_counter() - start, files=report.files_considered)
+    metrics.count("dedupe.bytes_read", report.bytes_read)
+    return report
+
+
+def _distinct_inodes(paths: List[str], stamps: Dict[str, Tuple[int, int]]) -> List[str]:
+    """Drop paths that are hard links to a file already in the list.
+
+    The (size, mtime_ns) of every path kept is added to `stamps`.
+    """
+    seen = set()
+    distinct = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        key = (st.st_dev, st.st_ino)
+        if key not in seen:
+            seen.add(key)
+            distinct.append(path)
+            stamps[path] = (st.st_size, st.st_mtime_ns)
+    return distinct
+
+
+def _partial_hash(path: str, size: int) -> Tuple[bytes, bool]:
+    """Hash the head and tail of a file; the bool says if that was the whole file."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        if size <= 2 * HASH_BLOCK:
+            h.update(f.read())
+            return h.digest(), True
+        h.update(f.read(HASH_BLOCK))
+        f.seek(size - HASH_BLOCK)
+        h.update(f.read(HASH_BLOCK))
+    return h.digest(), False
+
+
+def _full_hash(path: str) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(READ_BUFFER)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.digest()
+
+
+def dedupe(groups: Iterable[DuplicateGroup], action: str,
+           progress: Optional[Callable[[int], None]] = None) -> DedupeResult:
+    """Apply `action` to every duplicate (all paths but the first) in `groups`.
+
+    'skip' leaves files alone, 'hardlink' replaces each duplicate with a hard
+    link to the kept copy, and 'delete' removes the duplicates. A report can
+    be acted on long after the scan, so the kept copy and each duplicate are
+    checked first: any that changed size or modification time since then
+    is left alone and reported as failed (StaleFileError).
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown dedupe action: {action}")
+    result = DedupeResult()
+    if action == 'skip':
+        return result
+    for group in groups:
+        keeper = group.paths[0]
+        for duplicate in group.paths[1:]:
+            try:
+                for path in (keeper, duplicate):
+                    if not _unchanged(path, group.stamps.get(path)):
+                        raise StaleFileError(f"{path} changed since the duplicate scan")
+                if action == 'hardlink':
+                    _replace_with_link(keeper, duplicate)
+                else:
+                    os.remove(duplicate)
+                result.processed += 1
+                result.bytes_reclaimed += group.size
+            except OSError as e:
+                print(f"Error deduplicating {duplicate}: {e}")
+                result.failed.append((duplicate, e))
+            if progress is not None:
+                progress(result.processed)
+    return result
+
+
+def _unchanged(path: str, stamp: Optional[Tuple[int, int]]) -> bool:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return stamp is not None and (st.st_size, st.st_mtime_ns) == stamp
+
+
+def _replace_with_link(keeper: str, duplicate: str):
+    """Atomically swap `duplicate` for a hard link to `keeper`."""
+    # A short fixed-size name: suffixing the duplicate could push it past NAME_MAX
+    temp = os.path.join(os.path.dirname(duplicate), f".dedupe-{os.getpid()}-{next(_temp_ids)}")
+    os.link(keeper, temp)
+    try:
+        os.replace(temp, duplicate)
+    except OSError:
+        os.remove(temp)
+        raise
@@ -0,0 +1,199 @@
+import os
+import queue
+import stat
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from perf import metrics
+from scanner import FileRecord
+
+DEFAULT_SIZERS = min(8, (os.cpu_count() or 1) * 2)
+MAX_CACHED_DIRS = 500_000  # The cache is dropped wholesale beyond this many directories
+
+
+class DirEntrySummary:
+    """What one directory holds directly, valid while its mtime is unchanged."""
+
+    __slots__ = ('mtime_ns', 'file_bytes', 'files', 'subdirs')
+
+    def __init__(self, mtime_ns: int, file_bytes: int, files: int, subdirs: Tuple[str, ...]):
+        self.mtime_ns = mtime_ns
+        self.file_bytes = file_bytes
+        self.files = files
+        self.subdirs = subdirs
+
+
+class DirSizeCache:
+    """Per-directory summaries shared by every sizing job of a session.
+
+    A directory's mtime changes whenever an entry is added, removed or
+    renamed in it, so a summary whose mtime still matches can be reused
+    and the directory need not be listed again. Checking a whole subtree
+    then costs one stat per directory instead of one per file, which is
+    what makes going back up with on_nav_up, or into a subfolder that was
+    already counted from its parent, cheap. Files that grow in place keep
+    their directory's mtime; Refresh drops the affected summaries. The
+    cache may be dropped at any time; jobs keep their own totals.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, DirEntrySummary] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[DirEntrySummary]:
+        return self._entries.get(path)
+
+    def put(self, path: str, summary: DirEntrySummary):
+        with self._lock:
+            if len(self._entries) >= MAX_CACHED_DIRS:
+                self._entries.clear()
+            self._entries[path] = summary
+
+    def invalidate(self, prefix: str):
+        """Forget `prefix` and everything below it."""
+        below = prefix.rstrip(os.sep) + os.sep
+        with self._lock:
+            for path in [p for p in self._entries if p == prefix or p.startswith(below)]:
+                del self._entries[path]
+
+
+class DirSizeJob:
+    """Computes the total size of several directory trees on a pool of threads.
+
+    Every directory of every tree is one task on a shared queue, so a
+    single huge folder is spread over all workers instead of pinning one.
+    Each root keeps a count of its outstanding directories and a running
+    total; when the count reaches zero the total is queued for the UI, so
+    small folders show up long before large ones finish.
+    """
+
+    def __init__(self, roots: List[str], cache: DirSizeCache, workers: int = DEFAULT_SIZERS):
+        self.roots = roots
+        self.cache = cache
+        self.results: "queue.Queue[Tuple[str, int, int]]" = queue.Queue()
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self._tasks: "queue.Queue[Tuple[str, int]]" = queue.Queue()
+        self._pending = [1] * len(roots)
+        self._totals = [[0, 0] for _ in roots]  # [bytes, files] per root
+        self._lock = threading.Lock()
+        self._remaining = len(roots)
+        self._workers = max(1, workers)
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def start(self) -> "DirSizeJob":
+        self.started = time.perf_counter()
+        if not self.roots:
+            self.finished.set()
+            return self
+        for index, root in enumerate(self.roots):
+            self._tasks.put((root, index))
+        for i in range(self._workers):
+            threading.Thread(target=self._run, name=f"dirsize-{i}", daemon=True).start()
+        return self
+
+    def _summarize(self, path: str) -> Optional[DirEntrySummary]:
+        """A current summary of `path`, from the cache if it is still valid."""
+        try:
+            mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+        except OSError:
+            return None
+        metrics.count("syscalls.stat")
+        cached = self.cache.get(path)
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            metrics.count("dirsize.reused")
+            return cached
+        file_bytes = files = 0
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if stat.S_ISDIR(st.st_mode):
+                        subdirs.append(entry.path)
+                    else:
+                        file_bytes += st.st_size
+                        files += 1
+        except OSError:
+            pass
+        metrics.count("syscalls.scandir")
+        metrics.count("dirsize.scanned")
+        summary = DirEntrySummary(mtime_ns, file_bytes, files, tuple(subdirs))
+        self.cache.put(path, summary)
+        return summary
+
+    def _run(self):
+        while not self.cancelled.is_set() and not self.finished.is_set():
+            try:
+                path, index = self._tasks.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            summary = None if self.cancelled.is_set() else self._summarize(path)
+            subdirs = summary.subdirs if summary is not None else ()
+            with self._lock:
+                if summary is not None:
+                    totals = self._totals[index]
+                    totals[0] += summary.file_bytes
+                    totals[1] += summary.files
+                # Count children before they are queued so the root can't finish early
+                self._pending[index] += len(subdirs) - 1
+                root_done = self._pending[index] == 0
+                if root_done:
+                    self._remaining -= 1
+            for subdir in subdirs:
+                self._tasks.put((subdir, index))
+            if root_done:
+                self.results.put((self.roots[index], *self._totals[index]))
+                if self._remaining == 0:
+                    self.elapsed = time.perf_counter() - self.started
+                    metrics.add_span("dirsize", self.started, self.elapsed, roots=len(self.roots))
+                    self.finished.set()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def drain(self) -> List[Tuple[str, int, int]]:
+        """Every (root, bytes, files) completed since the last call."""
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+    @property
+    def completed(self) -> int:
+        """Roots whose total is known."""
+        return len(self.roots) - self._remaining
+
+    @property
+    def done(self) -> bool:
+        return (self.finished.is_set() or self.cancelled.is_set()) and self.results.empty()
+
+
+class DirSizer:
+    """Starts sizing jobs against one long-lived DirSizeCache."""
+
+    def __init__(self, workers: int = DEFAULT_SIZERS):
+        self.workers = workers
+        self.cache = DirSizeCache()
+
+    def start(self, roots: List[str]) -> DirSizeJob:
+        return DirSizeJob(roots, self.cache, self.workers).start()
+
+    def invalidate(self, prefix: str):
+        self.cache.invalidate(prefix)
+
+
+def with_folder_sizes(records: List[FileRecord], workers: int = DEFAULT_SIZERS) -> List[FileRecord]:
+    """`records` with every folder's size replaced by the bytes below it (blocking)."""
+    job = DirSizeJob([r.path for r in records if r.is_dir], DirSizeCache(), workers).start()
+    job.finished.wait()
+    totals = {path: total for path, total, _files in job.drain()}
+    return [FileRecord(r.name, r.path, totals[r.path], r.modified, True) if r.is_dir else r
+            for r in records]
@@ -0,0 +1,239 @@
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from listing_cache import default_cache_dir
+from organize_engine import (CHUNK_SIZE, DEFAULT_WORKERS, OrganizePlan, OrganizeResult, PlannedMove,
+                             device_of, mark_cross_device)
+from transfer import DEFAULT_TRANSFERS
+
+PLAN_VERSION = 1
+# Used until a run on the same filesystems has been measured; deliberately on the slow side
+DEFAULT_RENAME_SECONDS = 0.0005        # Per rename, in one worker
+DEFAULT_COPY_RATE = 50 * 1024 * 1024   # Bytes per second, per copy stream
+SMOOTHING = 0.5                        # Weight of the newest measurement
+# Smaller runs are dominated by noise and are not learned from
+MIN_RENAMES = 20
+MIN_COPY_BYTES = 4 * 1024 * 1024
+
+
+class PlanError(ValueError):
+    """A saved plan file is unreadable or from an incompatible version."""
+
+
+def _category_dir(plan: OrganizePlan, move: PlannedMove) -> str:
+    return plan.category_dirs.get(move.category, os.path.dirname(move.target))
+
+
+def default_throughput_path() -> Path:
+    return default_cache_dir() / "throughput.json"
+
+
+class ThroughputHistory:
+    """Rename and copy speeds measured by earlier runs, kept between sessions.
+
+    Renames are keyed by the filesystem of the organized folder and copies
+    by the (source, target) filesystem pair, using st_dev. Each run folds
+    its measurement into the stored value, so estimates follow the disks
+    as they actually behave rather than a synthetic benchmark.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else default_throughput_path()
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            data = {}
+        self.renames: Dict[str, float] = dict(data.get('renames', {}))
+        self.copies: Dict[str, float] = dict(data.get('copies', {}))
+
+    def rename_seconds(self, device: Optional[int]) -> Optional[float]:
+        """Measured seconds per rename on `device`, if any run measured it."""
+        return self.renames.get(str(device))
+
+    def copy_rate(self, source_device: Optional[int], target_device: Optional[int]) -> Optional[float]:
+        """Measured bytes per second of one copy stream between two filesystems."""
+        return self.copies.get(f"{source_device}>{target_device}")
+
+    @staticmethod
+    def _blend(table: Dict[str, float], key: str, value: float):
+        old = table.get(key)
+        table[key] = value if old is None else old + SMOOTHING * (value - old)
+
+    def record(self, plan: OrganizePlan, result: OrganizeResult) -> bool:
+        """Learn from an executed plan; returns True if anything was measured."""
+        learned = False
+        if result.renamed >= MIN_RENAMES and result.rename_seconds > 0:
+            self._blend(self.renames, str(device_of(plan.directory)), result.rename_seconds / result.renamed)
+            learned = True
+        if result.bytes_copied >= MIN_COPY_BYTES and result.copy_seconds > 0:
+            devices: Dict[str, Optional[int]] = {}
+            mark_cross_device(plan, devices)
+            pairs = {(devices[os.path.dirname(m.source)], devices[_category_dir(plan, m)])
+                     for m in plan.moves if m.cross_device}
+            for source_device, target_device in pairs:
+                self._blend(self.copies, f"{source_device}>{target_device}",
+                            result.bytes_copied / result.copy_seconds)
+                learned = True
+        return learned
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        temp.write_text(json.dumps({'renames': self.renames, 'copies': self.copies}, indent=2),
+                        encoding='utf-8')
+        os.replace(temp, self.path)
+
+
+class PlanEstimate:
+    """What a plan will do, and roughly how long it will take, before anything moves."""
+
+    def __init__(self, plan: OrganizePlan):
+        self.plan = plan
+        self.files = len(plan.moves)
+        self.bytes = 0
+        self.renamed = 0
+        self.cross_device_files = 0
+        self.cross_device_bytes = 0
+        self.categories: Dict[str, List[int]] = {}  # Category -> [files, bytes]
+        self.seconds = 0.0
+        self.measured = True  # False if any part of the estimate used a default rate
+
+    def summary_lines(self) -> List[str]:
+        from organizer_core import format_size
+
+        lines = [f"{self.files} file(s), {format_size(self.bytes)} to move into "
+                 f"{len(self.categories)} folder(s)"]
+        if self.renamed:
+            lines.append(f"{self.renamed} file(s) renamed to avoid a name collision")
+        if self.cross_device_files:
+            lines.append(f"{self.cross_device_files} file(s), {format_size(self.cross_device_bytes)} "
+                         f"copied to another drive")
+        guess = "" if self.measured else " (no earlier run measured these drives yet, rough guess)"
+        lines.append(f"Estimated time: {format_duration(self.seconds)}{guess}")
+        for category, (files, size) in sorted(self.categories.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"  {category:<24} {files:>8} files {format_size(size):>10}")
+        return lines
+
+    def as_dict(self) -> dict:
+        return {
+            'directory': os.path.abspath(self.plan.directory),
+            'files': self.files,
+            'bytes': self.bytes,
+            'renamed': self.renamed,
+            'cross_device_files': self.cross_device_files,
+            'cross_device_bytes': self.cross_device_bytes,
+            'estimated_seconds': self.seconds,
+            'measured': self.measured,
+            'categories': {category: {'files': files, 'bytes': size}
+                           for category, (files, size) in self.categories.items()},
+            'moves': [{'source': m.source, 'target': m.target, 'category': m.category, 'size': m.size,
+                       'renamed': m.renamed, 'cross_device': m.cross_device} for m in self.plan.moves],
+        }
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 1:
+        return "under a second"
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 5400:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def estimate_plan(plan: OrganizePlan, workers: int = DEFAULT_WORKERS, transfers: int = DEFAULT_TRANSFERS,
+                  history: Optional[ThroughputHistory] = None) -> PlanEstimate:
+    """Summarize a plan and predict its run time from measured throughput.
+
+    Only metadata already in the plan is used, plus one stat per folder to
+    find which moves cross filesystems. This follows how execute_plan runs:
+    renames are spread over the worker chunks, while copies run alongside
+    them on a pool of `transfers` threads, one file per thread, so the run
+    takes as long as the slower of the two and never less than its
+    largest copy.
+    """
+    history = history if history is not None else ThroughputHistory()
+    estimate = PlanEstimate(plan)
+    devices: Dict[str, Optional[int]] = {}
+    mark_cross_device(plan, devices)
+
+    renames = 0
+    # (source device, target device) -> [bytes, largest file]
+    copy_bytes: Dict[Tuple[Optional[int], Optional[int]], List[int]] = {}
+    copies = 0
+    for move in plan.moves:
+        estimate.bytes += move.size
+        estimate.renamed += move.renamed
+        totals = estimate.categories.setdefault(move.category, [0, 0])
+        totals[0] += 1
+        totals[1] += move.size
+        if move.cross_device:
+            copies += 1
+            estimate.cross_device_bytes += move.size
+            pair = (devices[os.path.dirname(move.source)], devices[_category_dir(plan, move)])
+            totals = copy_bytes.setdefault(pair, [0, 0])
+            totals[0] += move.size
+            totals[1] = max(totals[1], move.size)
+        else:
+            renames += 1
+    estimate.cross_device_files = copies
+
+    rename_seconds = copy_seconds = 0.0
+    if renames:
+        per_rename = history.rename_seconds(device_of(plan.directory))
+        if per_rename is None:
+            per_rename = DEFAULT_RENAME_SECONDS
+            estimate.measured = False
+        parallel = max(1, min(workers, math.ceil(renames / CHUNK_SIZE)))
+        rename_seconds = renames * per_rename / parallel
+    if copies:
+        stream_seconds = 0.0
+        for (source_device, target_device), (size, largest) in copy_bytes.items():
+            rate = history.copy_rate(source_device, target_device)
+            if rate is None:
+                rate = DEFAULT_COPY_RATE
+                estimate.measured = False
+            stream_seconds += size / rate
+            copy_seconds = max(copy_seconds, largest / rate)
+        copy_seconds = max(copy_seconds, stream_seconds / max(1, min(transfers, copies)))
+    estimate.seconds = max(rename_seconds, copy_seconds)
+    return estimate
+
+
+def save_plan(plan: OrganizePlan, path: str):
+    """Write a plan as JSON so it can be executed later without planning again."""
+    data = {
+        'version': PLAN_VERSION,
+        'directory': os.path.abspath(plan.directory),
+        'created': time.time(),
+        'category_dirs': {category: os.path.abspath(d) for category, d in plan.category_dirs.items()},
+        'moves': [[os.path.abspath(m.source), os.path.abspath(m.target), m.category, m.size, m.cross_device]
+                  for m in plan.moves],
+    }
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(temp, path)
+
+
+def load_plan(path: str) -> OrganizePlan:
+    """Read a plan written by save_plan()."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except ValueError as e:
+        raise PlanError(f"{path} is not a plan file: {e}") from None
+    if not isinstance(data, dict) or data.get('version') != PLAN_VERSION:
+        raise PlanError(f"{path} is not a version {PLAN_VERSION} plan file")
+    try:
+        plan = OrganizePlan(data['directory'])
+        plan.category_dirs = dict(data['category_dirs'])
+        plan.moves = [PlannedMove(source, target, category, size, cross_device)
+                      for source, target, category, size, cross_device in data['moves']]
+    except (KeyError, TypeError, ValueError) as e:
+        raise PlanError(f"{path} is damaged: {e}") from None
+    return plan
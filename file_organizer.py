@@ -1,15 +1,29 @@
 import os
-import shutil
-import time
 import math
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from datetime import datetime
 import dearpygui.dearpygui as dpg
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple, Set
+from typing import Callable, List, Dict, Optional, Tuple
 import colorsys
 from enum import Enum
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from categories import category_index, get_category
+from dedupe import DuplicateReport, dedupe
+from dir_sizes import DirSizeJob, DirSizer
+from fswatch import DirectoryWatcher, watch_directory
+from listing_cache import ListingCache, default_cache_dir
+from perf import PROFILE_MODES, Capture, metrics, profiled
+from rules import RuleError, default_rules_path, load_default_rules
+from dry_run import PlanEstimate, save_plan
+from organizer_core import (SORT_METHODS, FileModel, find_duplicates, format_size, format_time,
+                            interrupted_run, organize, preview_organize, resume_run, run_plan, undo_last_run)
+from scanner import BackgroundScanner, FileRecord, ScanJob
+from search_index import ANY_CATEGORY, DATE_FACETS, SIZE_FACETS, FileFilter
+from transfer import TransferMonitor
 
 class ThemeColor(Enum):
     PRIMARY = (0, 120, 215)
@@ -24,210 +38,820 @@ class ThemeColor(Enum):
     WARNING = (230, 126, 34)
     DANGER = (231, 76, 60)
 
-# File type categories
-FILE_CATEGORIES = {
-    'Images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp'],
-    'Documents': ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.xls', '.xlsx', '.ppt', '.pptx'],
-    'Archives': ['.zip', '.rar', '.7z', '.tar', '.gz'],
-    'Audio': ['.mp3', '.wav', '.ogg', '.flac', '.aac'],
-    'Videos': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.mkv'],
-    'Code': ['.py', '.js', '.html', '.css', '.java', '.c', '.cpp', '.h', '.json', '.xml'],
-    'Executables': ['.exe', '.msi', '.bat', '.sh']
-}
+# Virtualized file table
+ROW_HEIGHT = 24  # Fixed row height so a scroll offset maps directly to a row index
+OVERSCAN = 8     # Extra rows kept bound above and below the visible window
+
+MOVE_ACTION_LABELS = {"check": "Organizing", "organize": "Organizing", "resume": "Resuming", "undo": "Undoing"}
+
+# Duplicate groups listed in the results window; the rest are summarized
+MAX_DUPLICATE_GROUPS_SHOWN = 200
+# Planned moves listed in the preview window; the rest are summarized
+MAX_PREVIEW_MOVES_SHOWN = 200
+
+PERF_OVERLAY_INTERVAL = 0.5  # Seconds between refreshes of the debug overlay
+FOLDER_SIZE_INTERVAL = 0.25  # Seconds between re-sorts while folder sizes stream in
+MAX_PATCHED_ROWS = 32  # Above this many changed records the view is rebuilt instead of patched
+
+
+class FileTable:
+    """Virtualized view over a list of file records.
+
+    The table only ever holds a fixed pool of rows: enough to cover the
+    viewport plus some overscan. Two padding rows stand in for everything
+    above and below that window, and scrolling rebinds the pooled rows to
+    different records instead of creating new items.
+    """
+
+    def __init__(self, table: str, describe: Callable[[FileRecord], Tuple]):
+        self.table = table
+        self.describe = describe
+        self.items: List[FileRecord] = []
+        self.first = 0
+        self.rows: List[Tuple[int, int, int, int, int]] = []
+        self.bound: List[Optional[FileRecord]] = []
+        self.top_pad = None
+        self.bottom_pad = None
+        self._last_scroll = -1.0
+
+    def build(self, capacity: int):
+        """Create the padding rows and an initial pool of rows."""
+        self.top_pad = dpg.add_table_row(parent=self.table, show=False)
+        self.bottom_pad = dpg.add_table_row(parent=self.table, show=False)
+        self.ensure_capacity(capacity)
+
+    def ensure_capacity(self, capacity: int):
+        """Grow the row pool so it can cover `capacity` rows."""
+        while len(self.rows) < capacity:
+            with dpg.table_row(parent=self.table, before=self.bottom_pad, height=ROW_HEIGHT, show=False) as row:
+                with dpg.group(horizontal=True):
+                    icon = dpg.add_text("")
+                    name = dpg.add_text("")
+                size = dpg.add_text("", color=ThemeColor.TEXT_SECONDARY.value)
+                modified = dpg.add_text("", color=ThemeColor.TEXT_SECONDARY.value)
+            self.rows.append((row, icon, name, size, modified))
+            self.bound.append(None)
+        self._last_scroll = -1.0
+
+    def set_items(self, items: List[FileRecord]):
+        """Replace the records shown by the table and rebind the window."""
+        self.items = items
+        self.refresh(force=True)
+
+    def poll(self):
+        """Rebind rows if the table has been scrolled since the last frame."""
+        if self.top_pad is None:
+            return
+        if dpg.get_y_scroll(self.table) != self._last_scroll:
+            self.refresh()
+
+    def refresh(self, force: bool = False):
+        """Bind the pooled rows to the records around the scroll position."""
+        scroll = dpg.get_y_scroll(self.table)
+        if not force and scroll == self._last_scroll:
+            return
+        self._last_scroll = scroll
+
+        capacity = len(self.rows)
+        total = len(self.items)
+        first = max(0, int(scroll // ROW_HEIGHT) - OVERSCAN)
+        first = min(first, max(0, total - capacity))
+        self.first = first
+        shown = min(capacity, total - first)
+
+        self._set_pad(self.top_pad, first * ROW_HEIGHT)
+        self._set_pad(self.bottom_pad, (total - first - shown) * ROW_HEIGHT)
+
+        rendered = 0
+        for slot, (row, icon, name, size, modified) in enumerate(self.rows):
+            if slot >= shown:
+                if self.bound[slot] is not None:
+                    dpg.hide_item(row)
+                    self.bound[slot] = None
+                continue
+            record = self.items[first + slot]
+            if self.bound[slot] is record:
+                continue
+            icon_text, name_color, size_text, time_text = self.describe(record)
+            dpg.set_value(icon, icon_text)
+            dpg.set_value(name, record.name)
+            dpg.configure_item(name, color=name_color)
+            dpg.set_value(size, size_text)
+            dpg.set_value(modified, time_text)
+            if self.bound[slot] is None:
+                dpg.show_item(row)
+            self.bound[slot] = record
+            rendered += 1
+        if rendered:
+            metrics.count("table.rows_rendered", rendered)
+
+    def _set_pad(self, pad, height: int):
+        if height > 0:
+            dpg.configure_item(pad, height=height, show=True)
+        else:
+            dpg.configure_item(pad, show=False)
+
 
 class FileOrganizer:
     def __init__(self):
         self.current_dir = str(Path.home() / "Documents")
-        self.sort_methods = ["Name (A-Z)", "Name (Z-A)", "Date Modified (Newest)", 
-                           "Date Modified (Oldest)", "Size (Largest)", "Size (Smallest)"]
+        self.sort_methods = SORT_METHODS
         self.current_sort = self.sort_methods[0]
-        self.files: List[Dict] = []
+        self.model = FileModel()
+        self.files: List[FileRecord] = []  # self.model in current_sort order, filtered
+        self.file_filter = FileFilter()
+        self.file_table = FileTable("file_list", self.describe_row)
+        self.listing_cache = self._open_listing_cache()
+        self.scanner = BackgroundScanner(cache=self.listing_cache)
+        self.scan_job: Optional[ScanJob] = None
+        self.watcher: Optional[DirectoryWatcher] = None
+        self._scan_replaces_files = False
+        # Organize and dedupe runs share one worker so they never touch files at the same time
+        self.task_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task")
+        self.organize_future: Optional[Future] = None
+        self.organize_progress = (0, 0)
+        self.organize_action = "organize"
+        self.transfer_monitor: Optional[TransferMonitor] = None
+        self.dupes_future: Optional[Future] = None
+        self.dupes_report: Optional[DuplicateReport] = None
+        self.preview_future: Optional[Future] = None
+        self.preview: Optional[PlanEstimate] = None
+        self.profile_mode: Optional[str] = None  # Profile the next organize/undo/dedupe task
+        self.last_capture: Optional[Capture] = None
+        self._perf_shown_at = 0.0
+        self.dir_sizer = DirSizer()
+        self.size_jobs: List[DirSizeJob] = []
+        self.dir_totals: Dict[str, int] = {}  # Folder path -> subtree bytes, for the current listing
+        self._folder_records: Dict[str, FileRecord] = {}  # Folder path -> its record before sizing
+        self._pending_sizes: Dict[str, int] = {}
+        self._sizes_shown_at = 0.0
         self.setup_gui()
         dpg.set_primary_window("Primary Window", True)
         
     def get_category(self, filename: str) -> str:
         """Determine the category of a file based on its extension."""
-        ext = os.path.splitext(filename)[1].lower()
-        for category, extensions in FILE_CATEGORIES.items():
-            if ext in extensions:
-                return category
-        return 'Other'
+        return get_category(filename)
         
     def organize_files(self):
-        """Organize files in the current directory into subdirectories by category."""
+        """Organize files in the current directory into subdirectories by category.
+
+        Planning and moving run on a worker thread; _pump_organize() reports
+        progress and shows the result once it finishes. If the last run in
+        this folder was interrupted, the user is offered to resume it first.
+        """
         if not os.path.isdir(self.current_dir):
             return
-            
-        # Get all files in the current directory
+        if self.organize_future is not None and not self.organize_future.done():
+            return
+        
+        # Looking for an interrupted run reads journals, so that happens off the render thread too
+        self.organize_action = "check"
+        self.organize_future = self.task_executor.submit(interrupted_run, self.current_dir)
+        dpg.set_value("status_text", "Organizing...")
+    
+    def on_undo(self):
+        """Move the files of the last organize run in this folder back."""
+        if self.organize_future is not None and not self.organize_future.done():
+            return
+        self._start_move_task("undo", undo_last_run, self.current_dir, monitor=TransferMonitor())
+    
+    def _start_move_task(self, action: str, func: Callable, *args, **kwargs):
+        self.organize_action = action
+        self.organize_progress = (0, 0)
+        self.transfer_monitor = kwargs.get("monitor")
+        
+        def on_progress(done, total):
+            self.organize_progress = (done, total)
+        
+        self.organize_future = self.task_executor.submit(self._maybe_profiled(func, action), *args,
+                                                         progress=on_progress, **kwargs)
+        dpg.set_value("status_text", f"{MOVE_ACTION_LABELS[action]}...")
+    
+    def _pump_organize(self):
+        """Report progress of a running organize/undo and handle its completion."""
+        future = self.organize_future
+        if future is None:
+            return
+        if not future.done():
+            done, total = self.organize_progress
+            text = f"{MOVE_ACTION_LABELS[self.organize_action]}... {done}/{total} files" if total else ""
+            if self.transfer_monitor is not None:
+                # Copies to another drive: total bytes plus the largest file in flight
+                copied, expected, active = self.transfer_monitor.snapshot()
+                if expected:
+                    text = f"{text or 'Copying...'}  {format_size(copied)} / {format_size(expected)}"
+                if active:
+                    path, file_done, size = max(active, key=lambda item: item[2])
+                    text += f"  {os.path.basename(path)} {100 * file_done // max(size, 1)}%"
+            if text:
+                dpg.set_value("status_text", text)
+            return
+        
+        self.organize_future = None
         try:
-            items = os.listdir(self.current_dir)
-            moved_files = 0
-            
-            for item in items:
-                item_path = os.path.join(self.current_dir, item)
-                if os.path.isfile(item_path):
-                    # Skip if it's a hidden file or this script
-                    if item.startswith('.') or item == os.path.basename(__file__):
-                        continue
-                        
-                    # Get the category and create directory if it doesn't exist
-                    category = self.get_category(item)
-                    category_dir = os.path.join(self.current_dir, category)
-                    os.makedirs(category_dir, exist_ok=True)
-                    
-                    # Move the file
-                    dest_path = os.path.join(category_dir, item)
-                    try:
-                        # Handle duplicate filenames
-                        counter = 1
-                        base, ext = os.path.splitext(item)
-                        while os.path.exists(dest_path):
-                            new_name = f"{base}_{counter}{ext}"
-                            dest_path = os.path.join(category_dir, new_name)
-                            counter += 1
-                            
-                        shutil.move(item_path, dest_path)
-                        moved_files += 1
-                    except Exception as e:
-                        print(f"Error moving {item}: {e}")
-            
-            # Show completion message
-            if moved_files > 0:
-                tk.messagebox.showinfo(
-                    "Organization Complete",
-                    f"Successfully organized {moved_files} file(s) into categories."
-                )
-                self.update_file_list()  # Refresh the file list
-            else:
-                tk.messagebox.showinfo(
-                    "No Files to Organize",
-                    "No files were found that needed to be organized."
-                )
-                
+            result = future.result()
         except Exception as e:
-            tk.messagebox.showerror(
+            dpg.set_value("status_text", "Ready")
+            messagebox.showerror(
                 "Error",
                 f"An error occurred while organizing files: {str(e)}"
             )
+            return
+        
+        if self.organize_action == "check":
+            if result and messagebox.askyesno(
+                "Resume Organize",
+                "The last organize run in this folder was interrupted. Resume it?"
+            ):
+                self._start_move_task("resume", resume_run, result, monitor=TransferMonitor())
+            else:
+                options = self._organize_options()
+                if options is None:
+                    dpg.set_value("status_text", "Ready")
+                    return
+                self._start_move_task(
+                    "organize",
+                    organize,
+                    self.current_dir,
+                    verify=dpg.get_value("verify_checkbox"),
+                    monitor=TransferMonitor(),
+                    **options
+                )
+            return
+        
+        if result is None:
+            dpg.set_value("status_text", "Ready")
+            messagebox.showinfo("Nothing to Undo", "No organize run in this folder can be undone.")
+            return
+        
+        dpg.set_value("status_text", result.summary())
+        # Show completion message
+        if result.moved > 0:
+            if self.organize_action == "undo":
+                message = f"Moved {result.moved} file(s) back to where they were."
+            else:
+                message = f"Successfully organized {result.moved} file(s) into categories."
+            messagebox.showinfo(
+                "Undo Complete" if self.organize_action == "undo" else "Organization Complete",
+                f"{message}\n\n{result.summary()}"
+            )
+            if self.watcher is None:
+                self.update_file_list()  # Refresh the file list
+        elif result.failed:
+            messagebox.showerror(
+                "Error",
+                f"None of the {len(result.failed)} file(s) could be moved: {result.failed[0][1]}"
+            )
+        else:
+            messagebox.showinfo(
+                "No Files to Organize",
+                "No files were found that needed to be organized."
+            )
 
-    def get_file_info(self, file_path: str) -> Optional[Dict]:
+    def _organize_options(self) -> Optional[Dict]:
+        """Planning options from the toolbar, or None if the rule file is broken (after saying so)."""
+        # Re-read the rule file on every run so edits apply without a restart
         try:
-            stats = os.stat(file_path)
-            return {
-                'name': os.path.basename(file_path),
-                'path': file_path,
-                'size': stats.st_size,
-                'modified': stats.st_mtime,
-                'is_dir': os.path.isdir(file_path)
-            }
+            rules = load_default_rules()
+        except (OSError, RuleError) as e:
+            messagebox.showerror("Rule File Error", f"{default_rules_path()}:\n{e}")
+            return None
+        return {
+            "skip_names": (os.path.basename(__file__),),
+            "recursive": dpg.get_value("recursive_checkbox"),
+            "rules": rules,
+        }
+    
+    def on_preview(self):
+        """Plan an organize run in the background and show it, without moving anything."""
+        if not os.path.isdir(self.current_dir):
+            return
+        if self.preview_future is not None and not self.preview_future.done():
+            return
+        options = self._organize_options()
+        if options is None:
+            return
+        self.preview_future = self.task_executor.submit(
+            self._maybe_profiled(preview_organize, "preview"), self.current_dir, **options
+        )
+        dpg.set_value("status_text", "Planning...")
+    
+    def _pump_preview(self):
+        """Show the dry-run plan once it is ready."""
+        future = self.preview_future
+        if future is None or not future.done():
+            return
+        self.preview_future = None
+        try:
+            estimate = future.result()
         except Exception as e:
-            print(f"Error getting file info for {file_path}: {e}")
+            dpg.set_value("status_text", "Ready")
+            messagebox.showerror("Error", f"An error occurred while planning: {str(e)}")
+            return
+        self.preview = estimate
+        dpg.set_value("status_text", estimate.summary_lines()[0])
+        self.show_preview_window(estimate)
+    
+    def show_preview_window(self, estimate: PlanEstimate):
+        """Open a modal window with the planned moves and their estimated cost."""
+        if dpg.does_item_exist("preview_window"):
+            dpg.delete_item("preview_window")
+        
+        with dpg.window(label="Organize Preview", tag="preview_window", modal=True, width=720, height=460,
+                        on_close=lambda: dpg.delete_item("preview_window")):
+            for line in estimate.summary_lines():
+                dpg.add_text(line)
+            with dpg.child_window(height=-45, border=True):
+                directory = estimate.plan.directory
+                for move in estimate.plan.moves[:MAX_PREVIEW_MOVES_SHOWN]:
+                    notes = "".join(note for flag, note in ((move.renamed, "  (renamed)"),
+                                                            (move.cross_device, "  (other drive)")) if flag)
+                    dpg.add_text(f"{os.path.relpath(move.source, directory)}  ->  "
+                                 f"{os.path.relpath(move.target, directory)}{notes}",
+                                 color=ThemeColor.WARNING.value if notes else ThemeColor.TEXT.value)
+                hidden = len(estimate.plan.moves) - MAX_PREVIEW_MOVES_SHOWN
+                if hidden > 0:
+                    dpg.add_text(f"... and {hidden} more move(s)")
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="Organize now", callback=self.on_apply_preview)
+                dpg.add_button(label="Save plan...", callback=self.on_save_plan)
+                dpg.add_button(label="Close", callback=lambda: dpg.delete_item("preview_window"))
+    
+    def on_apply_preview(self):
+        """Carry out the previewed plan as is; the folder is not scanned again."""
+        estimate = self.preview
+        if estimate is None or (self.organize_future is not None and not self.organize_future.done()):
+            return
+        dpg.delete_item("preview_window")
+        self.preview = None
+        self._start_move_task(
+            "organize",
+            run_plan,
+            estimate.plan,
+            verify=dpg.get_value("verify_checkbox"),
+            monitor=TransferMonitor(),
+            recheck=True
+        )
+    
+    def on_save_plan(self):
+        """Save the previewed plan so `organizer_cli.py apply-plan` can run it later."""
+        if self.preview is None:
+            return
+        root = tk.Tk()
+        root.withdraw()
+        root.attributes('-topmost', True)
+        path = filedialog.asksaveasfilename(
+            initialdir=self.current_dir,
+            title="Save Organize Plan",
+            defaultextension=".plan",
+            filetypes=[("Organize plans", "*.plan"), ("All files", "*.*")]
+        )
+        root.destroy()
+        if not path:
+            return
+        try:
+            save_plan(self.preview.plan, path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save the plan: {e}")
+            return
+        dpg.set_value("status_text", f"Plan saved to {path}")
+    
+    def on_find_duplicates(self):
+        """Look for files with identical content in the current directory."""
+        if self.dupes_future is not None and not self.dupes_future.done():
+            return
+        self.dupes_future = self.task_executor.submit(
+            self._maybe_profiled(find_duplicates, "duplicates"),
+            self.current_dir,
+            recursive=dpg.get_value("recursive_checkbox")
+        )
+        dpg.set_value("status_text", "Looking for duplicates...")
+    
+    def _pump_dupes(self):
+        """Show duplicate search results, or the outcome of a dedupe action."""
+        future = self.dupes_future
+        if future is None or not future.done():
+            return
+        self.dupes_future = None
+        try:
+            outcome = future.result()
+        except Exception as e:
+            dpg.set_value("status_text", "Ready")
+            messagebox.showerror("Error", f"An error occurred while looking for duplicates: {str(e)}")
+            return
+        
+        if isinstance(outcome, DuplicateReport):
+            self.dupes_report = outcome
+            dpg.set_value(
+                "status_text",
+                f"{len(outcome.groups)} duplicate group(s), {format_size(outcome.wasted_bytes)} reclaimable"
+            )
+            self.show_duplicates_window(outcome)
+            return
+        
+        dpg.set_value("status_text", f"Reclaimed {format_size(outcome.bytes_reclaimed)}")
+        message = f"Processed {outcome.processed} duplicate(s), reclaiming {format_size(outcome.bytes_reclaimed)}."
+        if outcome.failed:
+            message += f"\n{len(outcome.failed)} file(s) could not be changed."
+        messagebox.showinfo("Duplicates", message)
+        if self.watcher is None:
+            self.update_file_list(use_cache=False)
+    
+    def show_duplicates_window(self, report: DuplicateReport):
+        """Open a modal window listing duplicate groups with dedupe actions."""
+        if dpg.does_item_exist("dupes_window"):
+            dpg.delete_item("dupes_window")
+        
+        with dpg.window(label="Duplicates", tag="dupes_window", modal=True, width=720, height=460,
+                        on_close=lambda: dpg.delete_item("dupes_window")):
+            dpg.add_text(
+                f"{len(report.groups)} group(s), {format_size(report.wasted_bytes)} reclaimable "
+                f"(read {format_size(report.bytes_read)} to check {report.files_considered} files)"
+            )
+            with dpg.child_window(height=-45, border=True):
+                for group in report.groups[:MAX_DUPLICATE_GROUPS_SHOWN]:
+                    dpg.add_text(f"{format_size(group.size)} x {len(group.paths)}", color=ThemeColor.PRIMARY.value)
+                    dpg.add_text(f"  keep  {group.paths[0]}", color=ThemeColor.TEXT_SECONDARY.value)
+                    for path in group.paths[1:]:
+                        dpg.add_text(f"  dup   {path}")
+                hidden = len(report.groups) - MAX_DUPLICATE_GROUPS_SHOWN
+                if hidden > 0:
+                    dpg.add_text(f"... and {hidden} more group(s)")
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="Replace with hard links", callback=lambda: self.on_dedupe('hardlink'))
+                dpg.add_button(label="Delete duplicates", callback=lambda: self.on_dedupe('delete'))
+                dpg.add_button(label="Close", callback=lambda: dpg.delete_item("dupes_window"))
+    
+    def on_dedupe(self, action: str):
+        """Apply a dedupe action to the last duplicate search results."""
+        report = self.dupes_report
+        if report is None or not report.groups:
+            return
+        count = sum(len(group.paths) - 1 for group in report.groups)
+        if action == 'delete' and not messagebox.askyesno(
+            "Delete Duplicates",
+            f"Delete {count} duplicate file(s)? The first copy in each group is kept."
+        ):
+            return
+        dpg.delete_item("dupes_window")
+        self.dupes_report = None
+        self.dupes_future = self.task_executor.submit(self._maybe_profiled(dedupe, "dedupe"), report.groups, action)
+        dpg.set_value("status_text", "Removing duplicates...")
+    
+    def _maybe_profiled(self, func: Callable, action: str) -> Callable:
+        """Wrap a background task in a profiler if one was requested for the next task."""
+        mode, self.profile_mode = self.profile_mode, None
+        if mode is None:
+            return func
+        if dpg.does_item_exist("perf_profile_combo"):
+            dpg.set_value("perf_profile_combo", "Off")
+        directory = default_cache_dir() / "profiles"
+        directory.mkdir(parents=True, exist_ok=True)
+        suffix = ".prof" if mode == "cprofile" else ".txt"
+        output = str(directory / f"{action}-{datetime.now():%Y%m%d-%H%M%S}{suffix}")
+        
+        def on_report(capture: Capture):
+            self.last_capture = capture
+        
+        return profiled(func, mode, output, on_report)
+    
+    def toggle_perf_overlay(self):
+        """Show or hide the debug overlay with timing spans and counters."""
+        if dpg.does_item_exist("perf_overlay"):
+            dpg.delete_item("perf_overlay")
+            return
+        width = 460
+        with dpg.window(label="Performance", tag="perf_overlay", width=width, height=420,
+                        pos=(max(0, dpg.get_viewport_client_width() - width - 20), 80),
+                        on_close=lambda: dpg.delete_item("perf_overlay")):
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="Export JSON", callback=lambda: self.on_export_metrics("json"))
+                dpg.add_button(label="Export Trace", callback=lambda: self.on_export_metrics("trace"))
+                dpg.add_button(label="Reset", callback=metrics.reset)
+            with dpg.group(horizontal=True):
+                dpg.add_text("Profile next task:")
+                dpg.add_combo(
+                    items=["Off", *PROFILE_MODES],
+                    default_value=self.profile_mode or "Off",
+                    width=120,
+                    tag="perf_profile_combo",
+                    callback=lambda sender, value: setattr(self, "profile_mode", None if value == "Off" else value)
+                )
+            dpg.add_text("", tag="perf_profile_text", color=ThemeColor.TEXT_SECONDARY.value)
+            dpg.add_separator()
+            dpg.add_text("", tag="perf_text")
+        self._perf_shown_at = 0.0
+    
+    def _pump_perf(self):
+        """Refresh the debug overlay a few times a second while it is open."""
+        if not dpg.does_item_exist("perf_overlay"):
+            return
+        now = time.perf_counter()
+        if now - self._perf_shown_at < PERF_OVERLAY_INTERVAL:
+            return
+        self._perf_shown_at = now
+        frame = metrics.spans.get("frame")
+        fps = f"{1 / frame.last:.0f} fps" if frame is not None and frame.last > 0 else ""
+        dpg.set_value("perf_text", "\n".join([fps, *metrics.summary_lines()]))
+        if self.last_capture is not None:
+            dpg.set_value("perf_profile_text", f"Last {self.last_capture.mode} profile: {self.last_capture.output}")
+    
+    def on_export_metrics(self, kind: str):
+        """Save the metrics as JSON or as a Chrome trace (chrome://tracing, Perfetto)."""
+        root = tk.Tk()
+        root.withdraw()
+        root.attributes('-topmost', True)
+        path = filedialog.asksaveasfilename(
+            title="Export Metrics" if kind == "json" else "Export Trace",
+            defaultextension=".json",
+            initialfile="metrics.json" if kind == "json" else "trace.json",
+            filetypes=[("JSON", "*.json")]
+        )
+        root.destroy()
+        if not path:
+            return
+        try:
+            if kind == "json":
+                metrics.export_json(path)
+            else:
+                metrics.export_chrome_trace(path)
+            dpg.set_value("status_text", f"Saved {path}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save {path}: {e}")
+    
+    def _open_listing_cache(self) -> Optional[ListingCache]:
+        try:
+            return ListingCache()
+        except Exception as e:
+            print(f"Warning: Could not open listing cache: {e}")
             return None
+    
+    def update_file_list(self, use_cache: bool = True):
+        """Start a background scan of the current directory.
 
-    def list_files(self, directory: str) -> List[Dict]:
+        Records are streamed into the table by _pump_scan() as they arrive;
+        any scan still running for a previous directory is cancelled.
+        Unchanged directories are served from the listing cache unless
+        `use_cache` is false. A watcher is started alongside the scan so
+        later changes can be patched in by _pump_watch().
+        """
+        self.scan_job = self.scanner.start(self.current_dir, use_cache=use_cache)
+        self._start_watcher()
+        self._stop_sizing()
+        self.dir_totals.clear()
+        self._folder_records.clear()
+        self._scan_replaces_files = True
+        if dpg.does_item_exist("status_text"):
+            dpg.set_value("status_text", "Scanning...")
+    
+    def _pump_scan(self):
+        """Move records from the running scan into the table (called every frame)."""
+        job = self.scan_job
+        if job is None:
+            return
+        
+        records = job.drain()
+        done = job.done
+        if records or (done and self._scan_replaces_files):
+            # Keep the old listing on screen until the new one starts arriving
+            if self._scan_replaces_files:
+                self.model.replace(records)
+                self._scan_replaces_files = False
+            else:
+                self.model.extend(records)
+            self._show_model()
+        
+        if not done:
+            dpg.set_value("status_text", f"Scanning... {job.scanned} items")
+            return
+        
+        self.scan_job = None
+        if job.error is not None:
+            print(f"Error listing directory {job.directory}: {job.error}")
+            dpg.set_value("status_text", f"Error: {job.error}")
+            self._stop_watcher()
+            return
+        
+        if self.watcher is not None:
+            self.watcher.seed(self.model.records)
+        self._start_sizing()
+        if job.from_cache:
+            stats = self.listing_cache.stats()
+            dpg.set_value(
+                "status_text",
+                f"Ready (cached, {job.elapsed:.2f}s, {stats['hits']} hits / {stats['misses']} misses)"
+            )
+        else:
+            dpg.set_value("status_text", f"Ready ({job.elapsed:.2f}s)")
+    
+    def _start_watcher(self):
+        self._stop_watcher()
         try:
-            items = []
-            for item in os.listdir(directory):
-                full_path = os.path.join(directory, item)
-                if file_info := self.get_file_info(full_path):
-                    items.append(file_info)
-            return items
-        except Exception as e:
-            print(f"Error listing directory {directory}: {e}")
-            return []
+            self.watcher = watch_directory(self.current_dir)
+        except OSError as e:
+            print(f"Warning: Could not watch {self.current_dir}: {e}")
+    
+    def _stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+    
+    def _pump_watch(self):
+        """Patch changes reported by the watcher into the listing (called every frame)."""
+        # Changes that arrive mid-scan stay queued until the scan has finished
+        if self.watcher is None or self.scan_job is not None:
+            return
+        delta = self.watcher.drain()
+        if not delta:
+            return
+        if delta.rescan:
+            self.update_file_list(use_cache=False)
+            return
+        replaced = self.model.apply_changes(delta.changes)
+        folders = []
+        for name, record in delta.changes.items():
+            path = os.path.join(self.current_dir, name)
+            self.dir_totals.pop(path, None)
+            self._folder_records.pop(path, None)
+            if record is not None and record.is_dir:
+                folders.append(path)
+        if len(replaced) == len(delta.changes):
+            self._show_changes(replaced)
+        else:
+            self._show_model()
+        if folders:
+            self._start_sizing(folders)
+    
+    def on_refresh(self):
+        """Rescan the current directory, forgetting cached folder sizes below it."""
+        self.dir_sizer.invalidate(self.current_dir)
+        self.update_file_list(use_cache=False)
+    
+    def on_folder_sizes_toggled(self, sender, app_data):
+        if app_data:
+            if self.scan_job is None:  # Otherwise the scan starts it once the listing is complete
+                self._start_sizing()
+        else:
+            self._stop_sizing()
+            self._forget_folder_sizes()
+    
+    def _forget_folder_sizes(self):
+        """Put back the folders' own records, so no stale totals are shown or sorted on."""
+        records = self.model.records
+        changes = {}
+        for path, original in self._folder_records.items():
+            index = self.model.position(original.name)
+            if index is not None and records[index].path == path:
+                changes[index] = original
+        replaced = [(records[i], record) for i, record in changes.items()]
+        self.model.update(changes)
+        self.dir_totals.clear()
+        self._folder_records.clear()
+        self._show_changes(replaced)
+    
+    def _start_sizing(self, roots: Optional[List[str]] = None):
+        """Measure every listed folder whose total is not known yet, in the background.
 
-    def sort_files(self, files: List[Dict]) -> List[Dict]:
-        if not files:
-            return []
+        Totals stream in through _pump_sizes(). Folders measured before, here
+        or from a parent or child directory, are mostly answered from the
+        sizer's cache, so navigating back and forth stays cheap. With
+        `roots`, only those folders are measured, next to any job already
+        running (folders the watcher reported as added or changed).
+        """
+        if roots is None:
+            self._stop_sizing()
+        if not dpg.get_value("folder_sizes_checkbox"):
+            return
+        if roots is None:
+            roots = [r.path for r in self.model.records if r.is_dir and r.path not in self.dir_totals]
+        if roots:
+            self.size_jobs.append(self.dir_sizer.start(roots))
+    
+    def _stop_sizing(self):
+        for job in self.size_jobs:
+            job.cancel()
+        self.size_jobs = []
+        self._pending_sizes.clear()
+    
+    def _pump_sizes(self):
+        """Stream finished folder totals into the listing (called every frame).
 
-        # Make a copy to avoid modifying the original list
-        sorted_files = files.copy()
-        
-        if "Name (A-Z)" in self.current_sort:
-            sorted_files.sort(key=lambda x: x['name'].lower())
-        elif "Name (Z-A)" in self.current_sort:
-            sorted_files.sort(key=lambda x: x['name'].lower(), reverse=True)
-        elif "Date Modified (Newest)" in self.current_sort:
-            sorted_files.sort(key=lambda x: x['modified'], reverse=True)
-        elif "Date Modified (Oldest)" in self.current_sort:
-            sorted_files.sort(key=lambda x: x['modified'])
-        elif "Size (Largest)" in self.current_sort:
-            sorted_files.sort(key=lambda x: x['size'], reverse=True)
-        elif "Size (Smallest)" in self.current_sort:
-            sorted_files.sort(key=lambda x: x['size'])
-            
-        # Always put directories first when sorting by name
-        if "Name" in self.current_sort:
-            sorted_files.sort(key=lambda x: not x['is_dir'])
-            
-        return sorted_files
+        Totals are applied in batches a few times a second, because each
+        batch re-sorts the listing when it is sorted by size.
+        """
+        jobs = self.size_jobs
+        if not jobs:
+            return
+        for job in jobs:
+            for path, total, _files in job.drain():
+                self._pending_sizes[path] = total
+        done = all(job.done for job in jobs)
+        now = time.perf_counter()
+        if self._pending_sizes and (done or now - self._sizes_shown_at >= FOLDER_SIZE_INTERVAL):
+            self._sizes_shown_at = now
+            records = self.model.records
+            changes = {}
+            for path, total in self._pending_sizes.items():
+                index = self.model.position(os.path.basename(path))
+                if index is None or records[index].path != path or not records[index].is_dir:
+                    continue
+                record = records[index]
+                self.dir_totals[path] = total
+                self._folder_records.setdefault(path, record)
+                changes[index] = FileRecord(record.name, path, total, record.modified, True)
+            self._pending_sizes.clear()
+            replaced = [(records[i], record) for i, record in changes.items()]
+            self.model.update(changes)
+            self._show_changes(replaced)
+        if done:
+            self.size_jobs = []
+            dpg.set_value("status_text", f"Ready (folder sizes in {jobs[-1].elapsed:.2f}s)")
+        else:
+            completed = sum(job.completed for job in jobs)
+            dpg.set_value("status_text", f"Measuring folders... {completed} of {sum(len(job.roots) for job in jobs)}")
+    
+    def _show_model(self):
+        """Show the model in the current sort order, minus rows the filter hides."""
+        with metrics.span("gui.show_model", records=len(self.model)):
+            self.files = self.file_filter.apply(self.model.records, self.model.order(self.current_sort))
+            self.file_table.set_items(self.files)
+            self._update_item_count()
+    
+    def _show_changes(self, replaced: List[Tuple[FileRecord, FileRecord]]):
+        """Show records the model replaced in place, as (old, new) pairs.
 
-    def update_file_list(self):
-        """Update the file list display with current directory contents."""
-        self.files = self.list_files(self.current_dir)
-        self.files = self.sort_files(self.files)
+        If the rows shown are still in the right order, only those records
+        are swapped in the shown list and the table rebinds just their rows.
+        """
+        if not replaced:
+            return
+        if (len(replaced) > MAX_PATCHED_ROWS or self.file_filter.active
+                or not self.model.in_order(self.current_sort)):
+            self._show_model()
+            return
+        files = self.files
+        try:
+            for old, new in replaced:
+                files[files.index(old)] = new
+        except ValueError:
+            self._show_model()
+            return
+        self.file_table.refresh(force=True)
+    
+    def _update_item_count(self):
+        file_count = len([f for f in self.files if not f.is_dir])
+        dir_count = len(self.files) - file_count
+        shown = f"{len(self.files)} of {len(self.model)}" if self.file_filter.active else f"{len(self.files)}"
+        dpg.set_value("item_count", f"{shown} items ({dir_count} folders, {file_count} files)")
+    
+    def on_filter_changed(self, sender, app_data, field: str):
+        """Apply a new filter text or facet to the loaded listing (no rescan)."""
+        setattr(self.file_filter, field, app_data)
+        with metrics.span("gui.filter", field=field):
+            self._show_model()
+    
+    def on_filter_clear(self):
+        defaults = {"filter_input": "", "filter_category": ANY_CATEGORY,
+                    "filter_size": next(iter(SIZE_FACETS)), "filter_date": next(iter(DATE_FACETS))}
+        for tag, value in defaults.items():
+            dpg.set_value(tag, value)
+        self.file_filter.text = ""
+        self.file_filter.category = ANY_CATEGORY
+        self.file_filter.size = defaults["filter_size"]
+        self.file_filter.date = defaults["filter_date"]
+        self._show_model()
+    
+    def _pump_filter(self):
+        """Build the name index a few milliseconds per frame while a name filter is in use."""
+        index = self.file_filter.index
+        if not self.file_filter.text.strip():
+            return
+        index.sync(self.model.records)
+        if not index.complete:
+            index.catch_up()
+    
+    def describe_row(self, file_info: FileRecord) -> Tuple[str, Tuple[int, int, int], str, str]:
+        """Return the icon, name color, size text and time text for a row."""
+        # Determine icon based on file type
+        if file_info.is_dir:
+            icon = "📁"
+            name_color = ThemeColor.PRIMARY.value
+        else:
+            category = category_index().lookup(file_info.name)
+            icon = category.icon
+            name_color = category.color or ThemeColor.TEXT.value
         
-        if dpg.does_item_exist("file_list"):
-            dpg.delete_item("file_list", children_only=True)
-            
-            # Add header
-            with dpg.table_row(parent="file_list"):
-                dpg.add_text("Name", width=400)
-                dpg.add_text("Size", width=100)
-                dpg.add_text("Modified", width=200)
-            
-            # Add files and directories with better styling
-            for file_info in self.files:
-                with dpg.table_row(parent="file_list"):
-                    # Determine icon based on file type
-                    if file_info['is_dir']:
-                        icon = "📁"
-                        name_color = ThemeColor.PRIMARY.value
-                    else:
-                        ext = os.path.splitext(file_info['name'])[1].lower()
-                        if ext in FILE_CATEGORIES['Images']:
-                            icon = "🖼️"
-                        elif ext in FILE_CATEGORIES['Documents']:
-                            icon = "📄"
-                        elif ext in FILE_CATEGORIES['Archives']:
-                            icon = "🗜️"
-                        elif ext in FILE_CATEGORIES['Audio']:
-                            icon = "🎵"
-                        elif ext in FILE_CATEGORIES['Videos']:
-                            icon = "🎬"
-                        elif ext in FILE_CATEGORIES['Code']:
-                            icon = "</>"
-                        elif ext in FILE_CATEGORIES['Executables']:
-                            icon = "⚙️"
-                        else:
-                            icon = "📄"
-                        name_color = ThemeColor.TEXT.value
-                    
-                    # Add file/directory name with icon
-                    with dpg.group(horizontal=True):
-                        dpg.add_text(icon)
-                        dpg.add_text(file_info['name'], color=name_color)
-                    
-                    # Add size (formatted)
-                    if not file_info['is_dir']:
-                        dpg.add_text(self.format_size(file_info['size']), color=ThemeColor.TEXT_SECONDARY.value)
-                    else:
-                        dpg.add_text("--", color=ThemeColor.TEXT_SECONDARY.value)
-                    
-                    # Add modified time
-                    mod_time = time.strftime('%Y-%m-%d %H:%M', time.localtime(file_info['modified']))
-                    dpg.add_text(mod_time, color=ThemeColor.TEXT_SECONDARY.value)
-            
-            # Update status bar
-            file_count = len([f for f in self.files if not f['is_dir']])
-            dir_count = len(self.files) - file_count
-            dpg.set_value("item_count", f"{len(self.files)} items ({dir_count} folders, {file_count} files)")
+        # Size (formatted) and modified time
+        if file_info.is_dir:
+            size_text = format_size(file_info.size) if file_info.path in self.dir_totals else "--"
+        else:
+            size_text = format_size(file_info.size)
+        return icon, name_color, size_text, format_time(file_info.modified)
     
-    def run(self):
-        """Run the application."""
-        dpg.show_viewport()
-        dpg.start_dearpygui()
-        dpg.destroy_context()
+    def _table_capacity(self) -> int:
+        """Number of pooled rows needed to cover the file list viewport."""
+        height = dpg.get_viewport_client_height() or dpg.get_viewport_height()
+        return math.ceil(height / ROW_HEIGHT) + 2 * OVERSCAN
     
     def on_nav_up(self):
         """Navigate to the parent directory."""
@@ -253,9 +877,9 @@ class FileOrganizer:
         root.destroy()  # Clean up the Tkinter window
     
     def on_sort_changed(self, sender, app_data):
-        """Handle sort method change."""
+        """Handle sort method change (reorders the loaded listing, no rescan)."""
         self.current_sort = dpg.get_value(sender)
-        self.update_file_list()
+        self._show_model()
     
     def setup_gui(self):
         """Set up the graphical user interface."""
@@ -302,8 +926,12 @@ class FileOrganizer:
                 nav_buttons = [
                     ("⬆️ Up", self.on_nav_up, 80),
                     ("📂 Browse", self.on_directory_select, 120),
-                    ("🔄 Refresh", lambda: self.update_file_list(), 100),
-                    ("🗂️ Organize", self.organize_files, 120)
+                    ("🔄 Refresh", self.on_refresh, 100),
+                    ("👁️ Preview", self.on_preview, 110),
+                    ("🗂️ Organize", self.organize_files, 120),
+                    ("↩️ Undo", self.on_undo, 90),
+                    ("🔍 Duplicates", self.on_find_duplicates, 130),
+                    ("⏱️ Perf", self.toggle_perf_overlay, 80)
                 ]
                 
                 for label, callback, width in nav_buttons:
@@ -314,6 +942,15 @@ class FileOrganizer:
                         height=30
                     )
                 
+                dpg.add_checkbox(label="Include subfolders", tag="recursive_checkbox", default_value=False)
+                dpg.add_checkbox(label="Verify copies", tag="verify_checkbox", default_value=False)
+                with dpg.tooltip("verify_checkbox"):
+                    dpg.add_text("Checksum files moved to another drive before deleting the originals")
+                dpg.add_checkbox(label="Folder sizes", tag="folder_sizes_checkbox", default_value=False,
+                                 callback=self.on_folder_sizes_toggled)
+                with dpg.tooltip("folder_sizes_checkbox"):
+                    dpg.add_text("Add up the contents of each folder in the background")
+                
                 dpg.add_spacer()
                 
                 # Sort dropdown
@@ -327,6 +964,23 @@ class FileOrganizer:
                         tag="sort_combo"
                     )
             
+            # Filter bar: narrows the loaded listing, keeps the sort order
+            with dpg.group(horizontal=True):
+                dpg.add_input_text(
+                    hint="Filter by name...",
+                    width=300,
+                    tag="filter_input",
+                    callback=self.on_filter_changed,
+                    user_data="text"
+                )
+                dpg.add_combo(items=[ANY_CATEGORY, *category_index().categories()], default_value=ANY_CATEGORY,
+                              width=150, tag="filter_category", callback=self.on_filter_changed, user_data="category")
+                dpg.add_combo(items=list(SIZE_FACETS), default_value=next(iter(SIZE_FACETS)),
+                              width=130, tag="filter_size", callback=self.on_filter_changed, user_data="size")
+                dpg.add_combo(items=list(DATE_FACETS), default_value=next(iter(DATE_FACETS)),
+                              width=150, tag="filter_date", callback=self.on_filter_changed, user_data="date")
+                dpg.add_button(label="✕ Clear", callback=self.on_filter_clear, height=24)
+            
             # File list
             with dpg.child_window(
                 tag="file_list_container",
@@ -355,6 +1009,7 @@ class FileOrganizer:
                     dpg.add_table_column(label="Name", width_stretch=True, init_width_or_weight=0.6)
                     dpg.add_table_column(label="Size", width_fixed=True, init_width_or_weight=0.2)
                     dpg.add_table_column(label="Modified", width_fixed=True, init_width_or_weight=0.2)
+                self.file_table.build(self._table_capacity())
             
             # Status bar
             with dpg.group(tag="status_bar", horizontal=True, width=-1, height=30):
@@ -375,7 +1030,12 @@ class FileOrganizer:
         
         # Update file list container height
         if dpg.does_item_exist("file_list_container"):
-            dpg.set_item_height("file_list_container", viewport_height - 160)  # Adjust based on header and toolbar heights
+            dpg.set_item_height("file_list_container", viewport_height - 196)  # Adjust based on header, toolbar and filter bar heights
+        
+        # Grow the row pool if the viewport now shows more rows
+        if self.file_table.top_pad is not None:
+            self.file_table.ensure_capacity(self._table_capacity())
+            self.file_table.refresh(force=True)
     
     def _adjust_color(self, color, factor):
         """Adjust color brightness by factor"""
@@ -477,7 +1137,26 @@ class FileOrganizer:
     def run(self):
         """Run the application."""
         dpg.show_viewport()
-        dpg.start_dearpygui()
+        while dpg.is_dearpygui_running():
+            start = time.perf_counter()
+            self._pump_scan()
+            self._pump_organize()
+            self._pump_dupes()
+            self._pump_preview()
+            self._pump_watch()
+            self._pump_sizes()
+            self._pump_filter()
+            self._pump_perf()
+            self.file_table.poll()
+            dpg.render_dearpygui_frame()
+            # Frames are only aggregated; one trace event per frame would crowd out everything else
+            metrics.add_span("frame", start, time.perf_counter() - start, trace=False)
+        self.scanner.shutdown()
+        self._stop_watcher()
+        self._stop_sizing()
+        self.task_executor.shutdown(wait=True)
+        if self.listing_cache is not None:
+            self.listing_cache.close()
         dpg.destroy_context()
 
 if __name__ == "__main__":
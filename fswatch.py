@@ -0,0 +1,240 @@
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from scanner import FileRecord, record_from_path, scan_directory
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+DEBOUNCE = 0.1          # Quiet period before a batch of events is flushed
+MAX_LATENCY = 0.5       # Flush at least this often while events keep arriving
+RESCAN_THRESHOLD = 5000  # Above this many changed names a full rescan is cheaper
+
+
+class Delta:
+    """Changes to one directory: name -> new record, or None if it is gone.
+
+    `rescan` means the watcher lost track (queue overflow, too many changes,
+    or the directory itself was moved or deleted) and the listing must be
+    reloaded from scratch.
+    """
+
+    __slots__ = ('changes', 'rescan')
+
+    def __init__(self, changes: Optional[Dict[str, Optional[FileRecord]]] = None, rescan: bool = False):
+        self.changes = changes if changes is not None else {}
+        self.rescan = rescan
+
+    def merge(self, other: "Delta"):
+        """Fold a later delta into this one."""
+        self.changes.update(other.changes)
+        self.rescan = self.rescan or other.rescan
+
+    def __bool__(self) -> bool:
+        return bool(self.changes) or self.rescan
+
+
+class DirectoryWatcher(ABC):
+    """Watches one directory on a background thread and queues Deltas.
+
+    Subclasses implement the watch loop in _run(), which puts Deltas on
+    `deltas` until close() is called, and seed().
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.deltas: "queue.Queue[Delta]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="watch", daemon=True)
+
+    def start(self) -> "DirectoryWatcher":
+        self._thread.start()
+        return self
+
+    @abstractmethod
+    def seed(self, records: List[FileRecord]):
+        """Tell the watcher what the caller's listing currently contains."""
+
+    def drain(self) -> Optional[Delta]:
+        """Merge and return every delta queued since the last call."""
+        merged = None
+        while True:
+            try:
+                delta = self.deltas.get_nowait()
+            except queue.Empty:
+                return merged
+            if merged is None:
+                merged = delta
+            else:
+                merged.merge(delta)
+
+    def close(self):
+        self._stop.set()
+
+    @abstractmethod
+    def _run(self):
+        """The watch loop, run on the watcher's thread."""
+
+    def _resolve(self, names) -> Delta:
+        """Stat every changed name to find its current state."""
+        if len(names) > RESCAN_THRESHOLD:
+            return Delta(rescan=True)
+        join = os.path.join
+        return Delta({name: record_from_path(join(self.directory, name)) for name in names})
+
+
+class InotifyWatcher(DirectoryWatcher):
+    """Linux watcher built directly on the inotify syscalls."""
+
+    _libc = None
+
+    @classmethod
+    def available(cls) -> bool:
+        if not sys.platform.startswith('linux'):
+            return False
+        if cls._libc is None:
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                libc.inotify_init1
+                libc.inotify_add_watch
+            except (OSError, AttributeError):
+                return False
+            cls._libc = libc
+        return True
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        if not self.available():
+            raise OSError("inotify is not available")
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, os.strerror(err), directory)
+
+    def seed(self, records: List[FileRecord]):
+        """Nothing to do: inotify reports changes without a baseline listing."""
+
+    def _run(self):
+        pending = set()
+        rescan = False
+        first_event = last_event = 0.0
+        try:
+            while not self._stop.is_set():
+                timeout = DEBOUNCE if pending or rescan else MAX_LATENCY
+                ready, _, _ = select.select([self._fd], [], [], timeout)
+                now = time.monotonic()
+                if ready:
+                    if not pending and not rescan:
+                        first_event = now
+                    last_event = now
+                    rescan |= self._read_events(pending)
+                if not (pending or rescan):
+                    continue
+                if now - last_event >= DEBOUNCE or now - first_event >= MAX_LATENCY:
+                    self.deltas.put(Delta(rescan=True) if rescan else self._resolve(pending))
+                    pending = set()
+                    rescan = False
+        finally:
+            os.close(self._fd)
+
+    def _read_events(self, pending: set) -> bool:
+        """Read queued events into `pending`; return True if a rescan is needed."""
+        rescan = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return rescan
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    rescan = True
+                elif name:
+                    pending.add(os.fsdecode(name))
+
+
+class PollingWatcher(DirectoryWatcher):
+    """Portable fallback that rescans the directory and diffs the listings.
+
+    The interval stretches with the cost of a scan so huge directories are
+    not rescanned back to back.
+    """
+
+    def __init__(self, directory: str, interval: float = 2.0):
+        super().__init__(directory)
+        self.interval = interval
+        self._snapshot: Dict[str, tuple] = {}
+        self._seeded = threading.Event()
+
+    def seed(self, records: List[FileRecord]):
+        self._snapshot = {r.name: (r.size, r.modified, r.is_dir) for r in records}
+        self._seeded.set()
+
+    def close(self):
+        super().close()
+        self._seeded.set()
+
+    def _run(self):
+        self._seeded.wait()
+        wait = self.interval
+        while not self._stop.wait(wait):
+            start = time.monotonic()
+            try:
+                records = scan_directory(self.directory)
+            except OSError:
+                self.deltas.put(Delta(rescan=True))
+                return
+            wait = max(self.interval, 10 * (time.monotonic() - start))
+
+            snapshot = {r.name: (r.size, r.modified, r.is_dir) for r in records}
+            old = self._snapshot
+            changes: Dict[str, Optional[FileRecord]] = {
+                r.name: r for r in records if old.get(r.name) != snapshot[r.name]
+            }
+            changes.update((name, None) for name in old.keys() - snapshot.keys())
+            self._snapshot = snapshot
+            if changes:
+                self.deltas.put(Delta(changes))
+
+
+def watch_directory(directory: str) -> DirectoryWatcher:
+    """Start the best available watcher for `directory`."""
+    if InotifyWatcher.available():
+        try:
+            return InotifyWatcher(directory).start()
+        except OSError as e:
+            print(f"Warning: inotify watch failed for {directory}, polling instead: {e}")
+    return PollingWatcher(directory).start()
@@ -0,0 +1,346 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from listing_cache import default_cache_dir
+from organize_engine import DEFAULT_WORKERS, OrganizePlan, OrganizeResult, PlannedMove, execute_plan, unique_name
+from transfer import TransferMonitor
+
+JOURNAL_VERSION = 1
+FLUSH_INTERVAL = 0.05  # Group commit window for completed-move records
+KEEP_JOURNALS = 20     # Finished runs kept per directory; older ones can no longer be undone
+# Execution options recorded with a run, so resume and undo copy files the same way
+RUN_OPTIONS = ('verify', 'transfers')
+
+
+def default_journal_dir() -> Path:
+    return default_cache_dir() / "journals"
+
+
+class Journal:
+    """Append-only, crash-safe record of one organize run.
+
+    The file is newline-delimited JSON. The plan is written and fsync'ed
+    before the first move, while completed moves are only recorded by plan
+    index and committed in groups: a flusher thread writes everything that
+    finished during the last FLUSH_INTERVAL as one line with one fsync, so
+    journaling never becomes the bottleneck. Moves lost in the window
+    before a crash are recovered by checking the disk on resume or undo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._pending: Dict[str, List[int]] = {'done': [], 'undone': []}
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._run_flusher, name="journal", daemon=True)
+        self._flusher.start()
+
+    @classmethod
+    def create(cls, journal_dir: Optional[str] = None) -> "Journal":
+        directory = Path(journal_dir) if journal_dir else default_journal_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{time.monotonic_ns() % 10**6}.jsonl"
+        return cls(str(directory / name))
+
+    def write(self, entry: dict):
+        """Write an entry and fsync it immediately (along with pending completions)."""
+        self.flush([json.dumps(entry, separators=(',', ':'))])
+
+    def begin(self, plan: OrganizePlan, options: Optional[dict] = None):
+        """Record the run, its RUN_OPTIONS and its full plan before anything is moved."""
+        # Nested targets like Archive/Large may create parents too; list them deepest first
+        new_dirs: Set[str] = set()
+        for category_dir in plan.category_dirs.values():
+            while category_dir != plan.directory and not os.path.isdir(category_dir) and category_dir not in new_dirs:
+                new_dirs.add(category_dir)
+                category_dir = os.path.dirname(category_dir)
+        self.write({'op': 'begin', 'version': JOURNAL_VERSION, 'directory': plan.directory,
+                    'time': time.time(),
+                    'options': {key: value for key, value in (options or {}).items() if key in RUN_OPTIONS}})
+        self.write({'op': 'plan', 'moves': [[m.source, m.target, m.category, m.size] for m in plan.moves],
+                    'new_dirs': sorted(new_dirs, key=len, reverse=True)})
+
+    def record(self, kind: str, indices: List[int]):
+        """Queue plan indices as 'done' or 'undone'; committed by the flusher."""
+        with self._lock:
+            self._pending[kind].extend(indices)
+
+    def flush(self, extra_lines: Optional[List[str]] = None):
+        with self._lock:
+            pending, self._pending = self._pending, {'done': [], 'undone': []}
+        lines = [json.dumps({'op': kind, 'i': indices}, separators=(',', ':'))
+                 for kind, indices in pending.items() if indices]
+        lines.extend(extra_lines or ())
+        if not lines:
+            return
+        with self._io_lock:
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _run_flusher(self):
+        while not self._closed.wait(FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except (OSError, ValueError) as e:
+                print(f"Error writing journal {self.path}: {e}")
+                return
+
+    def close(self):
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        self._file.close()
+
+
+class JournalState:
+    """What a journal says happened, as read back by load_journal()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.directory = ""
+        self.started = 0.0
+        self.options: dict = {}
+        self.moves: List[PlannedMove] = []
+        self.new_dirs: List[str] = []
+        self.done: Set[int] = set()
+        self.undone: Set[int] = set()
+        self.finished = False
+        self.undo_started = False
+        self.undo_finished = False
+
+    @property
+    def interrupted(self) -> bool:
+        """True if the organize run never recorded its end."""
+        return bool(self.moves) and not self.finished
+
+
+def load_journal(path: str) -> JournalState:
+    """Read a journal, ignoring a torn last line left by a crash."""
+    state = JournalState(path)
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            op = entry.get('op')
+            if op == 'begin':
+                state.directory = entry['directory']
+                state.started = entry['time']
+                state.options = entry.get('options', {})
+            elif op == 'plan':
+                state.moves = [PlannedMove(src, dst, category, size)
+                               for src, dst, category, size in entry['moves']]
+                state.new_dirs = entry.get('new_dirs', [])
+            elif op == 'retarget':
+                state.moves[entry['i']].target = entry['target']
+            elif op == 'done':
+                state.done.update(entry['i'])
+            elif op == 'undone':
+                state.undone.update(entry['i'])
+            elif op == 'end':
+                state.finished = True
+            elif op == 'undo':
+                state.undo_started = True
+            elif op == 'undo-end':
+                state.undo_finished = True
+    return state
+
+
+def find_journals(directory: Optional[str] = None, journal_dir: Optional[str] = None) -> List[str]:
+    """Journal paths, newest first, optionally only those for `directory`.
+
+    Runs are ordered by the start time recorded in their 'begin' entry,
+    which unlike the file name tells apart runs started in the same second.
+    """
+    root = Path(journal_dir) if journal_dir else default_journal_dir()
+    if not root.is_dir():
+        return []
+    wanted = os.path.normcase(os.path.abspath(directory)) if directory is not None else None
+    found = []
+    for path in map(str, root.glob("*.jsonl")):
+        try:
+            with open(path, encoding='utf-8') as f:
+                begin = json.loads(f.readline())
+        except (OSError, ValueError):
+            continue
+        if wanted is None or os.path.normcase(os.path.abspath(begin.get('directory', ''))) == wanted:
+            found.append((begin.get('time', 0.0), path))
+    found.sort(reverse=True)
+    return [path for _, path in found]
+
+
+def _journal_summary(path: str) -> Tuple[str, bool, bool]:
+    """(directory, finished, undo finished) of a journal, without parsing its plan."""
+    directory, finished, undone = "", False, False
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('{"op":"begin"'):
+                directory = json.loads(line).get('directory', '')
+            elif line.startswith('{"op":"end"'):
+                finished = True
+            elif line.startswith('{"op":"undo-end"'):
+                undone = True
+    return directory, finished, undone
+
+
+def prune_journals(journal_dir: Optional[str] = None, keep: int = KEEP_JOURNALS) -> int:
+    """Delete journals that are no longer useful; returns how many.
+
+    Runs that have been undone are removed, and so are finished runs beyond
+    the newest `keep` for their directory. Interrupted runs are always kept
+    so they can still be resumed or undone.
+    """
+    kept: Dict[str, int] = {}
+    removed = 0
+    for path in find_journals(journal_dir=journal_dir):  # Newest first
+        try:
+            directory, finished, undone = _journal_summary(path)
+        except (OSError, ValueError):
+            continue
+        key = os.path.normcase(os.path.abspath(directory))
+        if finished or undone:
+            kept[key] = kept.get(key, 0) + 1
+            if undone or kept[key] > keep:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    print(f"Warning: Could not remove journal {path}: {e}")
+    return removed
+
+
+def run_journaled(plan: OrganizePlan, workers: int = DEFAULT_WORKERS,
+                  progress: Optional[Callable[[int, int], None]] = None,
+                  journal_dir: Optional[str] = None, **options) -> OrganizeResult:
+    """Execute a plan while journaling it, so it can be undone or resumed.
+
+    `options` (verify, transfers, monitor) are passed on to execute_plan(),
+    and verify and transfers are recorded for resume() and undo(). Old
+    journals are pruned first (see prune_journals).
+    """
+    prune_journals(journal_dir)
+    journal = Journal.create(journal_dir)
+    try:
+        journal.begin(plan, options)
+        result = execute_plan(plan, workers, progress, on_moved=lambda indices: journal.record('done', indices),
+                              **options)
+        journal.write({'op': 'end', 'moved': result.moved, 'failed': len(result.failed)})
+    finally:
+        journal.close()
+    result.journal_path = journal.path
+    return result
+
+
+def _subplan(directory: str, moves: List[PlannedMove]) -> OrganizePlan:
+    plan = OrganizePlan(directory)
+    plan.moves = moves
+    for move in moves:
+        plan.category_dirs.setdefault(move.category, os.path.dirname(move.target))
+    return plan
+
+
+def resume(path: str, workers: int = DEFAULT_WORKERS,
+           progress: Optional[Callable[[int, int], None]] = None,
+           monitor: Optional[TransferMonitor] = None) -> OrganizeResult:
+    """Finish an interrupted organize run, skipping moves that already happened.
+
+    Copies to other filesystems use the verify and transfers options the
+    run was started with, and report bytes to `monitor`.
+
+    Moves the journal marks as done are skipped outright. For the rest the
+    disk decides: a source that is gone while its target exists was moved
+    just before the crash. A target taken by something else in the
+    meantime gets a fresh collision-free name.
+    """
+    state = load_journal(path)
+    journal = Journal(path)
+    try:
+        remaining, indices, already = [], [], []
+        listings: Dict[str, Set[str]] = {}
+        for index, move in enumerate(state.moves):
+            if index in state.done:
+                continue
+            if not os.path.lexists(move.source):
+                if os.path.lexists(move.target):
+                    already.append(index)
+                continue
+            target_dir, target_name = os.path.split(move.target)
+            if target_dir not in listings:
+                try:
+                    listings[target_dir] = set(os.listdir(target_dir))
+                except OSError:
+                    listings[target_dir] = set()
+            name = unique_name(target_name, listings[target_dir])
+            listings[target_dir].add(name)
+            # Categories are keyed by target directory so the renamed move keeps its folder
+            remaining.append(PlannedMove(move.source, os.path.join(target_dir, name), target_dir, move.size))
+            indices.append(index)
+        journal.record('done', already)
+
+        # Renamed targets must be journaled too, or undo would look in the wrong place
+        for index, move in zip(indices, remaining):
+            if move.target != state.moves[index].target:
+                journal.write({'op': 'retarget', 'i': index, 'target': move.target})
+
+        result = execute_plan(_subplan(state.directory, remaining), workers, progress,
+                              on_moved=lambda done: journal.record('done', [indices[i] for i in done]),
+                              monitor=monitor, **state.options)
+        journal.write({'op': 'end', 'moved': result.moved, 'failed': len(result.failed), 'resumed': True})
+    finally:
+        journal.close()
+    result.journal_path = path
+    return result
+
+
+def undo(path: str, workers: int = DEFAULT_WORKERS,
+         progress: Optional[Callable[[int, int], None]] = None,
+         monitor: Optional[TransferMonitor] = None) -> OrganizeResult:
+    """Move every file of a journaled run back where it came from.
+
+    Runs on the same parallel engine in reverse plan order and is itself
+    journaled, so an interrupted undo can simply be run again. Files whose
+    original location has been taken in the meantime are left alone and
+    reported as failures. Category folders the run created are removed if
+    they end up empty. Like resume(), it copies with the run's own options.
+    """
+    state = load_journal(path)
+    journal = Journal(path)
+    try:
+        journal.write({'op': 'undo', 'time': time.time()})
+        moves, indices = [], []
+        result = OrganizeResult()
+        for index in range(len(state.moves) - 1, -1, -1):
+            if index in state.undone:
+                continue
+            move = state.moves[index]
+            if index not in state.done and not (os.path.lexists(move.target) and not os.path.lexists(move.source)):
+                continue
+            if os.path.lexists(move.source):
+                result.failed.append((move.target, FileExistsError(f"{move.source} already exists")))
+                continue
+            source_dir = os.path.dirname(move.source)
+            moves.append(PlannedMove(move.target, move.source, source_dir, move.size))
+            indices.append(index)
+
+        executed = execute_plan(_subplan(state.directory, moves), workers, progress,
+                                on_moved=lambda done: journal.record('undone', [indices[i] for i in done]),
+                                monitor=monitor, **state.options)
+        executed.failed = result.failed + executed.failed
+        for directory in state.new_dirs:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+        journal.write({'op': 'undo-end', 'moved': executed.moved, 'failed': len(executed.failed)})
+    finally:
+        journal.close()
+    executed.journal_path = path
+    return executed
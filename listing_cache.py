@@ -0,0 +1,137 @@
+import marshal
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from scanner import FileRecord
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    device INTEGER NOT NULL,
+    entries BLOB NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_last_used ON listings (last_used);
+"""
+
+
+def default_cache_dir() -> Path:
+    """Per-user cache directory for the application."""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or str(Path.home() / "AppData" / "Local")
+    elif sys.platform == 'darwin':
+        base = str(Path.home() / "Library" / "Caches")
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / ".cache")
+    return Path(base) / "file_organizer"
+
+
+class ListingCache:
+    """Persistent cache of directory listings, stored in SQLite.
+
+    An entry is only used while the directory's own mtime, inode and device
+    still match the values recorded when it was scanned. That catches files
+    being added, removed or renamed, but not a file being rewritten in place,
+    so callers that need exact sizes should bypass the cache (the GUI does
+    this for an explicit Refresh). Entries are evicted least recently used
+    first once either `max_entries` or `max_bytes` is exceeded.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 512,
+                 max_bytes: int = 64 * 1024 * 1024):
+        if path is None:
+            cache_dir = default_cache_dir()
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            path = str(cache_dir / "listings.sqlite3")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS listings")
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.executescript(SCHEMA)
+
+    @staticmethod
+    def _key(directory: str) -> str:
+        return os.path.normcase(os.path.abspath(directory))
+
+    def get(self, directory: str, dir_stat: Optional[os.stat_result] = None) -> Optional[List[FileRecord]]:
+        """Return the cached listing of `directory`, or None if missing or stale."""
+        try:
+            st = dir_stat or os.stat(directory)
+        except OSError:
+            return None
+        key = self._key(directory)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT mtime_ns, inode, device, entries FROM listings WHERE path = ?", (key,)
+            ).fetchone()
+            if row is None or tuple(row[:3]) != (st.st_mtime_ns, st.st_ino, st.st_dev):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE listings SET last_used = ? WHERE path = ?", (time.time(), key))
+        join = os.path.join
+        return [FileRecord(name, join(directory, name), size, modified, is_dir)
+                for name, size, modified, is_dir in marshal.loads(row[3])]
+
+    def put(self, directory: str, records: List[FileRecord], dir_stat: os.stat_result):
+        """Store a listing, validated against `dir_stat` taken before the scan started."""
+        blob = marshal.dumps([(r.name, r.size, r.modified, r.is_dir) for r in records])
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._key(directory), dir_stat.st_mtime_ns, dir_stat.st_ino, dir_stat.st_dev,
+                 blob, len(blob), time.time())
+            )
+            self._evict()
+
+    def invalidate(self, directory: str):
+        with self._lock:
+            self._db.execute("DELETE FROM listings WHERE path = ?", (self._key(directory),))
+
+    def _evict(self):
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM listings").fetchone()
+        while count > self.max_entries or (total > self.max_bytes and count > 1):
+            row = self._db.execute(
+                "SELECT path, nbytes FROM listings ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            self._db.execute("DELETE FROM listings WHERE path = ?", (row[0],))
+            count -= 1
+            total -= row[1]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters plus the current size of the cache."""
+        with self._lock:
+            count, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM listings"
+            ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': count,
+            'bytes': total,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
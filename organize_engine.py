@@ -0,0 +1,368 @@
+import errno
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from perf import metrics
+from transfer import DEFAULT_TRANSFERS, TransferMonitor, move_file
+
+# Same formula ThreadPoolExecutor uses for its default; renames are I/O bound
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+CHUNK_SIZE = 256  # Moves handed to a worker per task, to keep executor overhead low
+
+# classify(name, path, size, mtime) -> category folder, relative to the organized directory
+Classifier = Callable[[str, str, int, float], str]
+
+
+class PlannedMove:
+    """A single file move decided by plan_moves()."""
+
+    __slots__ = ('source', 'target', 'category', 'size', 'cross_device')
+
+    def __init__(self, source: str, target: str, category: str, size: int, cross_device: bool = False):
+        self.source = source
+        self.target = target
+        self.category = category
+        self.size = size
+        self.cross_device = cross_device  # Set by mark_cross_device(); execute_plan checks for itself
+
+    @property
+    def renamed(self) -> bool:
+        """True if the file gets a new name to avoid a collision in its category folder."""
+        return os.path.basename(self.source) != os.path.basename(self.target)
+
+    def __repr__(self) -> str:
+        return f"PlannedMove({self.source!r} -> {self.target!r})"
+
+
+class OrganizePlan:
+    """Every move for one organize run, grouped by category directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.moves: List[PlannedMove] = []
+        self.category_dirs: Dict[str, str] = {}
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(move.size for move in self.moves)
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+
+class OrganizeResult:
+    """Outcome and throughput of executing an OrganizePlan."""
+
+    def __init__(self):
+        self.moved = 0
+        self.bytes_moved = 0
+        self.failed: List[Tuple[str, Exception]] = []
+        self.elapsed = 0.0
+        self.journal_path: Optional[str] = None
+        # Time spent inside renames and copies, summed over worker threads
+        self.renamed = 0
+        self.rename_seconds = 0.0
+        self.bytes_copied = 0
+        self.copy_seconds = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.moved / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_moved / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        mb = self.bytes_moved / (1024 * 1024)
+        text = (f"Moved {self.moved} file(s), {mb:.1f} MB in {self.elapsed:.2f}s "
+                f"({self.files_per_second:.0f} files/s, {self.bytes_per_second / (1024 * 1024):.1f} MB/s)")
+        if self.failed:
+            text += f", {len(self.failed)} failed"
+        return text
+
+
+def unique_name(name: str, taken: Set[str]) -> str:
+    """Return `name`, or `base_N.ext` for the first N not already in `taken`."""
+    if name not in taken:
+        return name
+    base, ext = os.path.splitext(name)
+    counter = 1
+    while f"{base}_{counter}{ext}" in taken:
+        counter += 1
+    return f"{base}_{counter}{ext}"
+
+
+def plan_moves(directory: str, categorize: Callable[[str], str],
+               skip_names: Iterable[str] = (), classify: Optional[Classifier] = None) -> OrganizePlan:
+    """Decide where every file in `directory` goes, without touching any file.
+
+    The directory is read in one scandir pass, and each existing category
+    directory is listed once, so duplicate names are resolved in memory
+    rather than by probing the disk for every candidate name. `classify`,
+    if given, replaces `categorize` (see _assign_targets).
+    """
+    skip = set(skip_names)
+    plan = OrganizePlan(directory)
+    files = []
+    with metrics.span("organize.plan", directory=directory), os.scandir(directory) as it:
+        for entry in it:
+            # Skip hidden files and anything the caller asked us to leave alone
+            if entry.name.startswith('.') or entry.name in skip:
+                continue
+            try:
+                if entry.is_file():
+                    st = entry.stat()
+                    files.append((entry.name, entry.path, st.st_size, st.st_mtime))
+            except OSError as e:
+                print(f"Error getting file info for {entry.path}: {e}")
+
+        metrics.count("syscalls.scandir")
+        metrics.count("syscalls.stat", len(files))
+        _assign_targets(plan, files, categorize, classify)
+    return plan
+
+
+def plan_tree_moves(root: str, categorize: Callable[[str], str], categories: Iterable[str],
+                    max_depth: Optional[int] = None, exclude: Iterable[str] = (),
+                    skip_names: Iterable[str] = (), workers: Optional[int] = None,
+                    classify: Optional[Classifier] = None) -> OrganizePlan:
+    """Plan moves for every file below `root` into category folders at `root`.
+
+    The tree is walked in parallel (see tree_walk.walk_files). Hidden
+    entries, names matching an `exclude` pattern and the top-level folders
+    named in `categories` are skipped, so a run never picks up files it (or
+    an earlier run) already sorted. Symlinked directories are not followed.
+    """
+    from tree_walk import DEFAULT_WALKERS, make_skip_rule, walk_files
+
+    skip_rule = make_skip_rule(list(exclude) + list(skip_names))
+    with metrics.span("organize.plan", directory=root, recursive=True):
+        records = walk_files(root, max_depth=max_depth, skip=skip_rule,
+                             skip_root_dirs=categories, workers=workers or DEFAULT_WALKERS)
+        plan = OrganizePlan(root)
+        _assign_targets(plan, [(r.name, r.path, r.size, r.modified) for r in records], categorize, classify)
+    return plan
+
+
+def _assign_targets(plan: OrganizePlan, files: List[Tuple[str, str, int, float]],
+                    categorize: Callable[[str], str], classify: Optional[Classifier] = None):
+    """Give each (name, path, size, mtime) a collision-free target in its category folder.
+
+    Categories come from `categorize(name)`, or from `classify(name, path,
+    size, mtime)` when given (e.g. a rules.RuleSet). A category may be a
+    nested '/'-separated folder such as "Archive/Large".
+    """
+    directory = plan.directory
+    taken: Dict[str, Set[str]] = {}
+    for name, path, size, mtime in files:
+        category = classify(name, path, size, mtime) if classify is not None else categorize(name)
+        category_dir = plan.category_dirs.get(category)
+        if category_dir is None:
+            category_dir = os.path.join(directory, *category.split('/'))
+            plan.category_dirs[category] = category_dir
+            try:
+                taken[category] = set(os.listdir(category_dir))
+            except OSError:
+                taken[category] = set()
+            metrics.count("syscalls.listdir")
+        target_name = unique_name(name, taken[category])
+        taken[category].add(target_name)
+        plan.moves.append(PlannedMove(path, os.path.join(category_dir, target_name), category, size))
+
+
+def _same_device(a: str, b: str) -> bool:
+    try:
+        return os.stat(a).st_dev == os.stat(b).st_dev
+    except OSError:
+        return False
+
+
+def device_of(path: str) -> Optional[int]:
+    """st_dev of `path`, or of its nearest existing parent (category folders may not exist yet)."""
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+
+def mark_cross_device(plan: OrganizePlan, devices: Optional[Dict[str, Optional[int]]] = None) -> int:
+    """Flag the moves that will be copied to another filesystem; returns how many.
+
+    Costs one stat per category folder and per distinct source folder,
+    not per file. `devices` (folder -> st_dev) is filled in as a side
+    effect, so callers can reuse the lookups.
+    """
+    if devices is None:
+        devices = {}
+
+    def device(path: str) -> Optional[int]:
+        if path not in devices:
+            devices[path] = device_of(path)
+            metrics.count("syscalls.stat")
+        return devices[path]
+
+    crossing = 0
+    for move in plan.moves:
+        source_dev = device(os.path.dirname(move.source))
+        target_dev = device(plan.category_dirs.get(move.category, os.path.dirname(move.target)))
+        move.cross_device = source_dev is not None and source_dev != target_dev
+        crossing += move.cross_device
+    return crossing
+
+
+def retarget_collisions(plan: OrganizePlan) -> int:
+    """Rename targets that were taken since the plan was made; returns how many.
+
+    A saved or previewed plan can sit for a while before it runs. Each
+    category folder is listed once more (no rescan of the sources), and a
+    target that now exists gets the next free name, as in planning.
+    """
+    by_dir: Dict[str, List[PlannedMove]] = {}
+    for move in plan.moves:
+        by_dir.setdefault(os.path.dirname(move.target), []).append(move)
+    changed = 0
+    for target_dir, moves in by_dir.items():
+        try:
+            existing = set(os.listdir(target_dir))
+        except OSError:
+            continue  # Not created yet, so nothing can be in the way
+        metrics.count("syscalls.listdir")
+        taken = existing | {os.path.basename(move.target) for move in moves}
+        for move in moves:
+            name = os.path.basename(move.target)
+            if name in existing:
+                name = unique_name(name, taken)
+                taken.add(name)
+                move.target = os.path.join(target_dir, name)
+                changed += 1
+    return changed
+
+
+def execute_plan(plan: OrganizePlan, workers: int = DEFAULT_WORKERS,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 on_moved: Optional[Callable[[List[int]], None]] = None,
+                 verify: bool = False, transfers: int = DEFAULT_TRANSFERS,
+                 monitor: Optional[TransferMonitor] = None) -> OrganizeResult:
+    """Carry out a plan with a bounded pool of worker threads.
+
+    Category directories are created once up front. Moves into a directory
+    on the same filesystem use a plain os.rename; moves to another
+    filesystem go through transfer.move_file on a separate pool of
+    `transfers` threads, with byte progress in `monitor` and, with
+    `verify`, a checksum comparison before each source is deleted.
+    `progress(done, total)` is called from worker threads, as is
+    `on_moved(indices)` with the plan indices each chunk or copy completed.
+    """
+    result = OrganizeResult()
+    start = time.perf_counter()
+
+    # Create every category directory once and decide how to move into it
+    usable: Dict[str, bool] = {}
+    for category, category_dir in plan.category_dirs.items():
+        try:
+            os.makedirs(category_dir, exist_ok=True)
+            usable[category] = True
+        except OSError as e:
+            print(f"Error creating {category_dir}: {e}")
+            usable[category] = False
+    fast = {category: _same_device(plan.directory, category_dir)
+            for category, category_dir in plan.category_dirs.items() if usable[category]}
+    if monitor is not None:
+        monitor.expect(sum(move.size for move in plan.moves if not fast.get(move.category, True)))
+
+    lock = threading.Lock()
+    total = len(plan.moves)
+    done = 0
+
+    def record(count: int, moved_indices: List[int], moved_bytes: int, failed: List[Tuple[str, Exception]],
+               renamed: int = 0, rename_seconds: float = 0.0, copied_bytes: int = 0, copy_seconds: float = 0.0):
+        """Account for `count` finished moves and report them."""
+        nonlocal done
+        moved = len(moved_indices)
+        with lock:
+            result.moved += moved
+            result.bytes_moved += moved_bytes
+            result.failed.extend(failed)
+            result.renamed += renamed
+            result.rename_seconds += rename_seconds
+            result.bytes_copied += copied_bytes
+            result.copy_seconds += copy_seconds
+            done += count
+            finished = done
+        metrics.count("syscalls.rename", renamed)
+        metrics.count("organize.copies", moved - renamed)
+        metrics.count("organize.files_moved", moved)
+        metrics.count("organize.bytes_moved", moved_bytes)
+        metrics.count("organize.failed", len(failed))
+        if on_moved is not None and moved_indices:
+            on_moved(moved_indices)
+        if progress is not None:
+            progress(finished, total)
+
+    def copy_one(index: int, move: PlannedMove):
+        started = time.perf_counter()
+        try:
+            move_file(move.source, move.target, verify, monitor)
+        except Exception as e:
+            print(f"Error moving {os.path.basename(move.source)}: {e}")
+            record(1, [], 0, [(move.source, e)])
+            return
+        record(1, [index], move.size, [], copied_bytes=move.size, copy_seconds=time.perf_counter() - started)
+
+    # Copies get their own pool of `transfers` threads, one file per task, so
+    # they run side by side however the plan is chunked for the renames
+    copier = ThreadPoolExecutor(max_workers=max(1, transfers), thread_name_prefix="transfer")
+
+    def run_chunk(first: int):
+        chunk = plan.moves[first:first + CHUNK_SIZE]
+        renamed = moved_bytes = 0
+        rename_seconds = 0.0
+        handled = 0
+        moved_indices = []
+        failed = []
+        for index, move in enumerate(chunk, first):
+            try:
+                if not usable[move.category]:
+                    raise OSError(f"Could not create {plan.category_dirs[move.category]}")
+                if not fast[move.category]:
+                    copier.submit(copy_one, index, move)
+                    continue
+                started = time.perf_counter()
+                try:
+                    os.rename(move.source, move.target)
+                except OSError as e:
+                    # A nested source can sit on another mount than the root
+                    if e.errno != errno.EXDEV:
+                        raise
+                    if monitor is not None:
+                        monitor.expect(move.size)
+                    copier.submit(copy_one, index, move)
+                    continue
+                rename_seconds += time.perf_counter() - started
+                renamed += 1
+                moved_bytes += move.size
+                moved_indices.append(index)
+            except Exception as e:
+                print(f"Error moving {os.path.basename(move.source)}: {e}")
+                failed.append((move.source, e))
+            handled += 1
+        record(handled, moved_indices, moved_bytes, failed, renamed, rename_seconds)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="organize") as executor:
+            # list() re-raises anything unexpected from the workers
+            list(executor.map(run_chunk, range(0, total, CHUNK_SIZE)))
+    finally:
+        copier.shutdown(wait=True)
+
+    result.elapsed = time.perf_counter() - start
+    metrics.add_span("organize.execute", start, result.elapsed, moves=total, workers=workers)
+    return result
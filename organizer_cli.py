@@ -0,0 +1,393 @@
+"""Command-line interface for the file organizer.
+
+Runs without tkinter or DearPyGui, so it works from cron and on headless
+servers. Heavier modules are only imported by the subcommand that needs them.
+
+Examples:
+    python organizer_cli.py list ~/Downloads --sort largest --format ndjson
+    python organizer_cli.py stats ~/Downloads --format json
+    python organizer_cli.py organize ~/Downloads
+    python organizer_cli.py organize ~/Inbox --recursive --max-depth 3 --exclude 'node_modules'
+    python organizer_cli.py organize ~/Downloads --rules my_rules.json
+    python organizer_cli.py organize /srv/shared --recursive --dry-run --save-plan shared.plan
+    python organizer_cli.py apply-plan shared.plan --progress
+    python organizer_cli.py dupes ~/Pictures --recursive --action hardlink
+    python organizer_cli.py undo ~/Downloads
+    python organizer_cli.py --trace trace.json --profile cprofile organize ~/Downloads
+"""
+import argparse
+import json
+import os
+import sys
+
+SORT_CHOICES = {
+    'name': "Name (A-Z)",
+    'name-desc': "Name (Z-A)",
+    'natural': "Name (Natural)",
+    'newest': "Date Modified (Newest)",
+    'oldest': "Date Modified (Oldest)",
+    'largest': "Size (Largest)",
+    'smallest': "Size (Smallest)",
+}
+
+
+def emit(args, payload, lines):
+    """Write `payload` as JSON, or one JSON object per line, or human readable `lines`."""
+    if args.format == 'json':
+        json.dump(payload, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    elif args.format == 'ndjson':
+        items = payload if isinstance(payload, list) else [payload]
+        for item in items:
+            sys.stdout.write(json.dumps(item) + "\n")
+    else:
+        for line in lines():
+            print(line)
+
+
+def cmd_list(args) -> int:
+    from organizer_core import format_size, format_time, sort_records
+    from scanner import scan_directory
+
+    records = scan_directory(args.directory)
+    if args.dir_sizes:
+        from dir_sizes import with_folder_sizes
+        records = with_folder_sizes(records)
+    records = sort_records(records, SORT_CHOICES[args.sort])
+
+    def lines():
+        for r in records:
+            size = "--" if r.is_dir and not args.dir_sizes else format_size(r.size)
+            yield f"{r.name + ('/' if r.is_dir else ''):<50} {size:>10}  {format_time(r.modified)}"
+
+    emit(args, [r.as_dict() for r in records], lines)
+    return 0
+
+
+def cmd_stats(args) -> int:
+    from organizer_core import directory_stats, format_size
+    from scanner import scan_directory
+
+    stats = directory_stats(scan_directory(args.directory))
+    stats['directory'] = os.path.abspath(args.directory)
+
+    def lines():
+        yield f"{stats['files'] + stats['folders']} items ({stats['folders']} folders, {stats['files']} files), {format_size(stats['bytes'])}"
+        for category, entry in sorted(stats['categories'].items(), key=lambda kv: -kv[1]['bytes']):
+            yield f"  {category:<12} {entry['files']:>8} files {format_size(entry['bytes']):>10}"
+
+    emit(args, stats, lines)
+    return 0
+
+
+def progress_printer(args, monitor=None):
+    """Progress callback printing files done and, with a monitor, bytes copied across devices."""
+    def progress(done, total):
+        if not args.progress:
+            return
+        line = f"{done}/{total} files"
+        if monitor is not None:
+            from organizer_core import format_size
+            copied, expected, active = monitor.snapshot()
+            if expected:
+                line += f", {format_size(copied)}/{format_size(expected)} copied"
+            if active:
+                path, file_done, size = max(active, key=lambda item: item[2])
+                line += f" ({os.path.basename(path)} {100 * file_done // max(size, 1)}%)"
+        print(f"\r{line:<79}", end="", file=sys.stderr, flush=True)
+    return progress
+
+
+def progress_ticker(progress, state, interval: float = 0.5):
+    """Re-print progress every `interval` seconds so long copies show movement."""
+    import threading
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            progress(*state)
+    threading.Thread(target=run, name="progress", daemon=True).start()
+    return stop
+
+
+def load_rule_set(args):
+    """The rule set named by --rules, else the user's default rule file (if any)."""
+    from rules import load_default_rules, load_rules
+
+    if args.no_rules:
+        return None
+    return load_rules(args.rules) if args.rules else load_default_rules()
+
+
+def cmd_organize(args) -> int:
+    from organizer_core import organize
+
+    if not os.path.isdir(args.directory):
+        print(f"Not a directory: {args.directory}", file=sys.stderr)
+        return 2
+
+    from rules import RuleError
+    try:
+        rules = load_rule_set(args)
+    except RuleError as e:
+        print(f"Error in rule file: {e}", file=sys.stderr)
+        return 2
+
+    if args.dry_run or args.save_plan:
+        return preview_moves(args, rules)
+    return run_moves(args, organize, args.directory, skip_names=(os.path.basename(__file__),),
+                     recursive=args.recursive, max_depth=args.max_depth, exclude=args.exclude,
+                     journal=not args.no_journal, rules=rules)
+
+
+def preview_moves(args, rules) -> int:
+    """Plan and estimate an organize run without moving anything; optionally save the plan."""
+    from organizer_core import preview_organize
+
+    estimate = preview_organize(args.directory, workers=args.workers, transfers=args.transfers,
+                                skip_names=(os.path.basename(__file__),), recursive=args.recursive,
+                                max_depth=args.max_depth, exclude=args.exclude, rules=rules)
+    if args.save_plan:
+        from dry_run import save_plan
+        save_plan(estimate.plan, args.save_plan)
+
+    def lines():
+        yield from estimate.summary_lines()
+        if args.save_plan:
+            yield f"Plan saved to {args.save_plan}; run it with: apply-plan {args.save_plan}"
+
+    emit(args, estimate.as_dict(), lines)
+    return 0
+
+
+def cmd_apply_plan(args) -> int:
+    from dry_run import PlanError, load_plan
+    from organizer_core import run_plan
+
+    try:
+        plan = load_plan(args.plan)
+    except PlanError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    args.directory = plan.directory
+    return run_moves(args, run_plan, plan, journal=not args.no_journal, recheck=True)
+
+
+def run_moves(args, func, *func_args, **kwargs) -> int:
+    """Run organize() or run_plan() with progress output and report the result."""
+    from transfer import TransferMonitor
+
+    monitor = TransferMonitor()
+    printer = progress_printer(args, monitor)
+    state = [0, 0]
+
+    def progress(done, total):
+        state[:] = [done, total]
+        printer(done, total)
+
+    ticker = progress_ticker(printer, state) if args.progress else None
+    try:
+        result = func(*func_args, workers=args.workers, progress=progress, verify=args.verify,
+                      transfers=args.transfers, monitor=monitor, **kwargs)
+    finally:
+        if ticker is not None:
+            ticker.set()
+    if args.progress:
+        print(file=sys.stderr)
+    return report_moves(args, result)
+
+
+def report_moves(args, result) -> int:
+    payload = {
+        'directory': os.path.abspath(args.directory),
+        'moved': result.moved,
+        'failed': [{'path': path, 'error': str(error)} for path, error in result.failed],
+        'bytes_moved': result.bytes_moved,
+        'elapsed': result.elapsed,
+        'files_per_second': result.files_per_second,
+        'journal': result.journal_path,
+    }
+    emit(args, payload, lambda: [result.summary()])
+    return 1 if result.failed else 0
+
+
+def cmd_undo(args) -> int:
+    from journal import undo
+    from organize_engine import DEFAULT_WORKERS
+    from organizer_core import undo_last_run
+    from transfer import TransferMonitor
+
+    monitor = TransferMonitor()
+    if args.journal:
+        result = undo(args.journal, args.workers or DEFAULT_WORKERS, progress_printer(args, monitor), monitor)
+    else:
+        result = undo_last_run(args.directory, args.workers, progress_printer(args, monitor), monitor)
+    if args.progress:
+        print(file=sys.stderr)
+    if result is None:
+        print(f"Nothing to undo in {args.directory}", file=sys.stderr)
+        return 1
+    return report_moves(args, result)
+
+
+def cmd_resume(args) -> int:
+    from organizer_core import interrupted_run, resume_run
+    from transfer import TransferMonitor
+
+    path = args.journal or interrupted_run(args.directory)
+    if path is None:
+        print(f"No interrupted run found for {args.directory}", file=sys.stderr)
+        return 1
+    monitor = TransferMonitor()
+    result = resume_run(path, args.workers, progress_printer(args, monitor), monitor)
+    if args.progress:
+        print(file=sys.stderr)
+    return report_moves(args, result)
+
+
+def cmd_dupes(args) -> int:
+    from dedupe import dedupe
+    from organizer_core import find_duplicates, format_size
+
+    report = find_duplicates(args.directory, recursive=args.recursive,
+                             max_depth=args.max_depth, exclude=args.exclude)
+    result = dedupe(report.groups, args.action)
+    payload = {
+        'directory': os.path.abspath(args.directory),
+        'groups': [group.as_dict() for group in report.groups],
+        'wasted_bytes': report.wasted_bytes,
+        'files_considered': report.files_considered,
+        'bytes_read': report.bytes_read,
+        'action': args.action,
+        'processed': result.processed,
+        'bytes_reclaimed': result.bytes_reclaimed,
+        'failed': [{'path': path, 'error': str(error)} for path, error in result.failed],
+    }
+
+    def lines():
+        for group in report.groups:
+            yield f"{format_size(group.size)} x {len(group.paths)}"
+            for i, path in enumerate(group.paths):
+                yield f"  {'keep' if i == 0 else 'dup ':<4} {path}"
+        yield (f"{len(report.groups)} duplicate group(s), {format_size(report.wasted_bytes)} reclaimable; "
+               f"read {format_size(report.bytes_read)} to check {report.files_considered} file(s)")
+        if args.action != 'skip':
+            yield f"{args.action}: {result.processed} file(s), {format_size(result.bytes_reclaimed)} reclaimed"
+
+    emit(args, payload, lines)
+    return 1 if result.failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="organizer_cli.py",
+        description="Organize files into category folders without starting the GUI."
+    )
+    parser.add_argument('--metrics', metavar='FILE', help="write timing spans and counters as JSON")
+    parser.add_argument('--trace', metavar='FILE', help="write a Chrome trace-event file (chrome://tracing)")
+    parser.add_argument('--profile', choices=['cprofile', 'tracemalloc'],
+                        help="profile the command and print the top entries to stderr")
+    parser.add_argument('--profile-out', metavar='FILE',
+                        help="also save the profile (pstats file for cprofile, text for tracemalloc)")
+    formats = argparse.ArgumentParser(add_help=False)
+    formats.add_argument('--format', choices=['text', 'json', 'ndjson'], default='text',
+                         help="output format (default: text)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('list', parents=[formats], help="list a directory")
+    p.add_argument('directory')
+    p.add_argument('--sort', choices=list(SORT_CHOICES), default='name')
+    p.add_argument('--dir-sizes', action='store_true', help="show (and sort by) the total size of each folder")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser('stats', parents=[formats], help="count files and bytes per category")
+    p.add_argument('directory')
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser('organize', parents=[formats], help="move files into category folders")
+    p.add_argument('directory')
+    p.add_argument('--workers', type=int, default=None, help="number of concurrent moves")
+    p.add_argument('--progress', action='store_true', help="show progress on stderr")
+    p.add_argument('-r', '--recursive', action='store_true',
+                   help="also organize files from subdirectories")
+    p.add_argument('--max-depth', type=int, default=None,
+                   help="with --recursive, how many levels below the directory to descend")
+    p.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                   help="skip files and folders matching this glob (repeatable)")
+    p.add_argument('--no-journal', action='store_true',
+                   help="don't record the run (it can then not be undone or resumed)")
+    p.add_argument('--verify', action='store_true',
+                   help="checksum files copied to another filesystem before deleting the originals")
+    p.add_argument('--transfers', type=int, default=None,
+                   help="concurrent copies to other filesystems (default: 4)")
+    p.add_argument('--rules', default=None, metavar='FILE',
+                   help="JSON rule file (default: the user's rules.json, if present)")
+    p.add_argument('--no-rules', action='store_true', help="ignore rule files, sort by extension only")
+    p.add_argument('-n', '--dry-run', action='store_true',
+                   help="only show what would be moved and estimate how long it would take")
+    p.add_argument('--save-plan', metavar='FILE',
+                   help="save the dry-run plan so apply-plan can run it later (implies --dry-run)")
+    p.set_defaults(func=cmd_organize)
+
+    p = sub.add_parser('apply-plan', parents=[formats], help="carry out a plan saved by organize --save-plan")
+    p.add_argument('plan')
+    p.add_argument('--workers', type=int, default=None, help="number of concurrent moves")
+    p.add_argument('--progress', action='store_true', help="show progress on stderr")
+    p.add_argument('--no-journal', action='store_true',
+                   help="don't record the run (it can then not be undone or resumed)")
+    p.add_argument('--verify', action='store_true',
+                   help="checksum files copied to another filesystem before deleting the originals")
+    p.add_argument('--transfers', type=int, default=None,
+                   help="concurrent copies to other filesystems (default: 4)")
+    p.set_defaults(func=cmd_apply_plan)
+
+    for name, func, text in (('undo', cmd_undo, "move the files of the last organize run back"),
+                             ('resume', cmd_resume, "finish an interrupted organize run")):
+        p = sub.add_parser(name, parents=[formats], help=text)
+        p.add_argument('directory')
+        p.add_argument('--journal', default=None, help="journal file to use instead of the latest one")
+        p.add_argument('--workers', type=int, default=None, help="number of concurrent moves")
+        p.add_argument('--progress', action='store_true', help="show progress on stderr")
+        p.set_defaults(func=func)
+
+    p = sub.add_parser('dupes', parents=[formats], help="find files with identical content")
+    p.add_argument('directory')
+    p.add_argument('--action', choices=['skip', 'hardlink', 'delete'], default='skip',
+                   help="what to do with each duplicate; the first path of a group is kept (default: skip)")
+    p.add_argument('-r', '--recursive', action='store_true', help="include subdirectories")
+    p.add_argument('--max-depth', type=int, default=None)
+    p.add_argument('--exclude', action='append', default=[], metavar='PATTERN')
+    p.set_defaults(func=cmd_dupes)
+    return parser
+
+
+def run_command(args) -> int:
+    """Run the subcommand, under a profiler if --profile was given."""
+    if not args.profile:
+        return args.func(args)
+    from perf import capture
+
+    with capture(args.profile, args.profile_out) as result:
+        status = args.func(args)
+    print(result.report, file=sys.stderr)
+    return status
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        status = run_command(args)
+        if args.metrics or args.trace:
+            from perf import metrics
+            if args.metrics:
+                metrics.export_json(args.metrics)
+            if args.trace:
+                metrics.export_chrome_trace(args.trace)
+        return status
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
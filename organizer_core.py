@@ -0,0 +1,366 @@
+import re
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from categories import category_index, get_category
+from perf import metrics
+from scanner import FileRecord, scan_directory
+
+# Shared by the GUI and the command line. Nothing here may import tkinter or
+# DearPyGui, so the CLI can run on headless machines. The organize engine is
+# imported on first use to keep `list` and `stats` start-up cheap.
+
+SORT_METHODS = ["Name (A-Z)", "Name (Z-A)", "Name (Natural)", "Date Modified (Newest)",
+                "Date Modified (Oldest)", "Size (Largest)", "Size (Smallest)"]
+
+_DIGITS = re.compile(r'(\d+)')
+
+
+def natural_key(name: str) -> tuple:
+    """Casefolded name with digit runs compared as numbers ("file2" < "file10")."""
+    parts = _DIGITS.split(name.casefold())
+    # split() puts the digit runs at the odd positions, so types line up between keys
+    parts[1::2] = [int(part) for part in parts[1::2]]
+    return tuple(parts)
+
+
+# Key builders, computed once per record. Directories come first in every name
+# order by folding the is_dir flag into the key instead of sorting twice.
+SORT_KEYS: Dict[str, Callable[[FileRecord], object]] = {
+    'name': lambda r: (not r.is_dir, r.name.casefold()),
+    'name_desc': lambda r: (r.is_dir, r.name.casefold()),
+    'natural': lambda r: (not r.is_dir, natural_key(r.name)),
+    'modified': lambda r: r.modified,
+    'size': lambda r: r.size,
+}
+
+# Sort method -> (key kind, reverse)
+SORT_SPECS: Dict[str, Tuple[str, bool]] = {
+    "Name (A-Z)": ('name', False),
+    "Name (Z-A)": ('name_desc', True),
+    "Name (Natural)": ('natural', False),
+    "Date Modified (Newest)": ('modified', True),
+    "Date Modified (Oldest)": ('modified', False),
+    "Size (Largest)": ('size', True),
+    "Size (Smallest)": ('size', False),
+}
+
+
+class FileModel:
+    """A directory listing with precomputed sort keys and cached sort orders.
+
+    Keys are built once per record and the permutation for each sort method
+    is kept, so switching between methods costs no I/O and no re-sort.
+    Records added with extend() are appended to the cached permutations and
+    re-sorted lazily; timsort merges the already sorted prefix in near-linear
+    time. Records swapped with update() are re-sorted the same way, but only
+    for sort methods whose key actually changed. apply_changes() patches in a
+    watcher delta with the same tools instead of starting over.
+    """
+
+    def __init__(self, records: Iterable[FileRecord] = ()):
+        self.records: List[FileRecord] = list(records)
+        self._keys: Dict[str, list] = {}
+        self._orders: Dict[str, List[int]] = {}
+        self._unsorted: Set[str] = set()
+        self._positions: Optional[Dict[str, int]] = None  # Name -> index, built on first use
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def extend(self, records: Iterable[FileRecord]):
+        start = len(self.records)
+        self.records.extend(records)
+        if self._positions is not None:
+            self._positions.update((r.name, i) for i, r in enumerate(self.records[start:], start))
+
+    def replace(self, records: Iterable[FileRecord]):
+        """Swap in a new listing, dropping every cached key and order."""
+        self.records = list(records)
+        self._keys.clear()
+        self._orders.clear()
+        self._unsorted.clear()
+        self._positions = None
+
+    def position(self, name: str) -> Optional[int]:
+        """Index of the record called `name`, or None."""
+        if self._positions is None:
+            self._positions = {r.name: i for i, r in enumerate(self.records)}
+        return self._positions.get(name)
+
+    def update(self, changes: Dict[int, FileRecord]):
+        """Replace records in place (index -> new record), e.g. folders whose size became known."""
+        records = self.records
+        positions = self._positions
+        for i, record in changes.items():
+            if positions is not None and records[i].name != record.name:
+                del positions[records[i].name]
+                positions[record.name] = i
+            records[i] = record
+        for kind, keys in self._keys.items():
+            make = SORT_KEYS[kind]
+            moved = False
+            for i, record in changes.items():
+                if i < len(keys):
+                    key = make(record)
+                    if key != keys[i]:
+                        keys[i] = key
+                        moved = True
+            if moved:
+                self._unsorted.update(method for method in self._orders if SORT_SPECS[method][0] == kind)
+
+    def in_order(self, method: str) -> bool:
+        """True if the cached `method` order still covers every record correctly."""
+        order = self._orders.get(method)
+        return order is not None and len(order) == len(self.records) and method not in self._unsorted
+
+    def apply_changes(self, changes: Dict[str, Optional[FileRecord]]) -> List[Tuple[FileRecord, FileRecord]]:
+        """Patch in name -> new record changes, None meaning the name is gone (an fswatch.Delta).
+
+        Known names are replaced with update() and new ones appended with
+        extend(); removed records are dropped from the keys and the cached
+        orders without re-sorting. A name that turned from a file into a
+        folder or back is removed and added again. Returns the (old, new)
+        records replaced in place.
+        """
+        records = self.records
+        replaced: Dict[int, FileRecord] = {}
+        removed: Set[int] = set()
+        added = []
+        for name, record in changes.items():
+            i = self.position(name)
+            if i is None:
+                if record is not None:
+                    added.append(record)
+            elif record is None:
+                removed.add(i)
+            elif record.is_dir != records[i].is_dir:
+                removed.add(i)
+                added.append(record)
+            else:
+                replaced[i] = record
+        pairs = [(records[i], record) for i, record in replaced.items()]
+        if replaced:
+            self.update(replaced)
+        if removed:
+            self._remove(removed)
+        if added:
+            self.extend(added)
+        return pairs
+
+    def _remove(self, removed: Set[int]):
+        # Dropping indices keeps the relative order of the rest, so cached orders only need renumbering
+        kept = [i for i in range(len(self.records)) if i not in removed]
+        renumber = [-1] * len(self.records)
+        for new, old in enumerate(kept):
+            renumber[old] = new
+        records = self.records
+        self.records = [records[i] for i in kept]  # A new list, so caches keyed on it start over
+        for kind, keys in self._keys.items():
+            self._keys[kind] = [key for i, key in enumerate(keys) if i not in removed]
+        for method, order in self._orders.items():
+            self._orders[method] = [renumber[i] for i in order if renumber[i] >= 0]
+        self._positions = None
+
+    def _key_list(self, kind: str) -> list:
+        keys = self._keys.setdefault(kind, [])
+        if len(keys) < len(self.records):
+            make = SORT_KEYS[kind]
+            keys.extend(make(r) for r in self.records[len(keys):])
+        return keys
+
+    def order(self, method: str) -> List[int]:
+        """Indices of the records in `method` order."""
+        kind, reverse = SORT_SPECS[method]
+        total = len(self.records)
+        order = self._orders.get(method)
+        if order is not None and len(order) == total and method not in self._unsorted:
+            return order
+        with metrics.span("sort", method=method, records=total):
+            keys = self._key_list(kind)
+            if order is None:
+                order = self._orders[method] = list(range(total))
+            else:
+                order.extend(range(len(order), total))
+            order.sort(key=keys.__getitem__, reverse=reverse)
+        self._unsorted.discard(method)
+        return order
+
+    def sorted(self, method: str) -> List[FileRecord]:
+        records = self.records
+        return [records[i] for i in self.order(method)]
+
+
+def sort_records(files: List[FileRecord], method: str) -> List[FileRecord]:
+    """Return a sorted copy of `files` using one of SORT_METHODS."""
+    return FileModel(files).sorted(method)
+
+
+def format_size(size: int) -> str:
+    """Format a byte count as a human readable string."""
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size < 1024 or unit == "TB":
+            return f"{size} B" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_time(timestamp: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def directory_stats(files: Iterable[FileRecord]) -> Dict:
+    """Counts and byte totals for a listing, overall and per category."""
+    stats = {'files': 0, 'folders': 0, 'bytes': 0, 'categories': {}}
+    categories = stats['categories']
+    for record in files:
+        if record.is_dir:
+            stats['folders'] += 1
+            continue
+        stats['files'] += 1
+        stats['bytes'] += record.size
+        entry = categories.setdefault(get_category(record.name), {'files': 0, 'bytes': 0})
+        entry['files'] += 1
+        entry['bytes'] += record.size
+    return stats
+
+
+def plan_organize(directory: str, skip_names: Iterable[str] = (), recursive: bool = False,
+                  max_depth: Optional[int] = None, exclude: Iterable[str] = (), rules=None):
+    """Decide every move of an organize run without touching any file.
+
+    Takes the same options as organize(). Returns an
+    organize_engine.OrganizePlan that run_plan() can carry out later.
+    """
+    from organize_engine import plan_moves, plan_tree_moves
+
+    classify = rules.classify if rules is not None else None
+    if recursive:
+        categories = category_index().categories()
+        if rules is not None:
+            categories = categories + rules.top_level_targets()
+        return plan_tree_moves(directory, get_category, categories, max_depth=max_depth,
+                               exclude=exclude, skip_names=skip_names, classify=classify)
+    return plan_moves(directory, get_category, skip_names, classify=classify)
+
+
+def preview_organize(directory: str, workers: Optional[int] = None, transfers: Optional[int] = None,
+                     **options):
+    """Dry run: plan an organize run and estimate its cost; nothing is moved.
+
+    `options` are those of plan_organize(). Returns a dry_run.PlanEstimate
+    whose `plan` can be handed to run_plan() as is, so the files are not
+    scanned again.
+    """
+    from dry_run import estimate_plan
+    from organize_engine import DEFAULT_WORKERS
+    from transfer import DEFAULT_TRANSFERS
+
+    plan = plan_organize(directory, **options)
+    return estimate_plan(plan, workers or DEFAULT_WORKERS, transfers or DEFAULT_TRANSFERS)
+
+
+def run_plan(plan, workers: Optional[int] = None, progress: Optional[Callable[[int, int], None]] = None,
+             journal: bool = True, verify: bool = False, transfers: Optional[int] = None, monitor=None,
+             recheck: bool = False):
+    """Execute a plan from plan_organize(), preview_organize() or dry_run.load_plan().
+
+    With `recheck`, for plans made a while ago, targets that have been
+    taken in the meantime get a fresh name first. The measured rename and
+    copy speeds are kept for the next estimate.
+    """
+    from organize_engine import DEFAULT_WORKERS, execute_plan, retarget_collisions
+    from transfer import DEFAULT_TRANSFERS
+
+    if recheck:
+        retarget_collisions(plan)
+    options = {'verify': verify, 'transfers': transfers or DEFAULT_TRANSFERS, 'monitor': monitor}
+    if not journal or not plan.moves:
+        result = execute_plan(plan, workers or DEFAULT_WORKERS, progress, **options)
+    else:
+        from journal import run_journaled
+        result = run_journaled(plan, workers or DEFAULT_WORKERS, progress, **options)
+
+    from dry_run import ThroughputHistory
+    try:
+        history = ThroughputHistory()
+        if history.record(plan, result):
+            history.save()
+    except OSError as e:
+        print(f"Warning: Could not save throughput measurements: {e}")
+    return result
+
+
+def organize(directory: str, skip_names: Iterable[str] = (), workers: Optional[int] = None,
+             progress: Optional[Callable[[int, int], None]] = None, recursive: bool = False,
+             max_depth: Optional[int] = None, exclude: Iterable[str] = (), journal: bool = True,
+             rules=None, verify: bool = False, transfers: Optional[int] = None, monitor=None):
+    """Organize the files in `directory` into category subdirectories.
+
+    With `recursive`, files from every level below `directory` (down to
+    `max_depth`, skipping `exclude` patterns) are gathered into the
+    top-level category folders. `rules` is an optional rules.RuleSet that
+    decides target folders before the extension categories do. Files going
+    to another filesystem are copied by at most `transfers` workers,
+    reporting bytes to `monitor` (a transfer.TransferMonitor), and with
+    `verify` each copy is checksummed before its source is deleted. Unless
+    `journal` is false the run is journaled so it can be undone or resumed.
+    Returns an organize_engine.OrganizeResult.
+    """
+    plan = plan_organize(directory, skip_names, recursive=recursive, max_depth=max_depth,
+                         exclude=exclude, rules=rules)
+    return run_plan(plan, workers, progress, journal=journal, verify=verify, transfers=transfers,
+                    monitor=monitor)
+
+
+def interrupted_run(directory: str) -> Optional[str]:
+    """Journal of the latest organize run in `directory` if it never finished."""
+    from journal import find_journals, load_journal
+
+    paths = find_journals(directory)
+    if not paths:
+        return None
+    # Only the latest run is considered; an older one was superseded by it
+    state = load_journal(paths[0])
+    if state.interrupted and not state.undo_started:
+        return paths[0]
+    return None
+
+
+def resume_run(path: str, workers: Optional[int] = None,
+               progress: Optional[Callable[[int, int], None]] = None, monitor=None):
+    """Finish an interrupted, journaled organize run."""
+    from journal import resume
+    from organize_engine import DEFAULT_WORKERS
+
+    return resume(path, workers or DEFAULT_WORKERS, progress, monitor)
+
+
+def undo_last_run(directory: str, workers: Optional[int] = None,
+                  progress: Optional[Callable[[int, int], None]] = None, monitor=None):
+    """Undo the most recent organize run in `directory` that is not undone yet.
+
+    Returns an organize_engine.OrganizeResult, or None if there is nothing to undo.
+    """
+    from journal import find_journals, load_journal, undo
+    from organize_engine import DEFAULT_WORKERS
+
+    for path in find_journals(directory):
+        if not load_journal(path).undo_finished:
+            return undo(path, workers or DEFAULT_WORKERS, progress, monitor)
+    return None
+
+
+def find_duplicates(directory: str, recursive: bool = False, max_depth: Optional[int] = None,
+                    exclude: Iterable[str] = ()):
+    """Find files with identical content in `directory` (and below, if recursive).
+
+    Returns a dedupe.DuplicateReport.
+    """
+    from dedupe import find_duplicates as find
+
+    if recursive:
+        from tree_walk import make_skip_rule, walk_files
+        records = walk_files(directory, max_depth=max_depth, skip=make_skip_rule(exclude))
+    else:
+        records = scan_directory(directory)
+    return find(records)
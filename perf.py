@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+MAX_EVENTS = 20000  # Trace events kept in memory; older ones are dropped first
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+# (counter, span, label): rates shown next to the phase they describe
+THROUGHPUT: List[Tuple[str, str, str]] = [
+    ('scan.entries', 'scan', 'entries/s'),
+    ('walk.files', 'walk', 'files/s'),
+    ('organize.files_moved', 'organize.execute', 'files/s'),
+    ('organize.bytes_moved', 'organize.execute', 'B/s'),
+    ('transfer.bytes', 'transfer', 'B/s per copy'),
+    ('dedupe.bytes_read', 'dedupe.find', 'B/s'),
+]
+
+
+class SpanStats:
+    __slots__ = ('count', 'total', 'max', 'last')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def as_dict(self) -> dict:
+        return {'count': self.count, 'total': self.total, 'max': self.max, 'last': self.last,
+                'mean': self.total / self.count if self.count else 0.0}
+
+
+class Metrics:
+    """Process-wide timing spans and counters.
+
+    Instrumented code records one span per phase (a scan, a sort, an
+    organize run) and bumps counters in bulk (per batch or chunk, never per
+    file), so the bookkeeping stays negligible next to the work measured.
+    Spans are aggregated by name and also kept as trace events for export
+    in Chrome's trace-event format (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, max_events: int = MAX_EVENTS):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.spans: Dict[str, SpanStats] = {}
+        self.events: Deque[tuple] = deque(maxlen=max_events)
+        self.origin = time.perf_counter()
+
+    def count(self, name: str, n: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_span(self, name: str, start: float, duration: float, trace: bool = True, **args):
+        """Record a finished span; with `trace` false it is only aggregated."""
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats()
+            stats.count += 1
+            stats.total += duration
+            stats.last = duration
+            if duration > stats.max:
+                stats.max = duration
+            if trace:
+                self.events.append((name, start, duration, threading.get_ident(), args))
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter() - start, **args)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.spans.clear()
+            self.events.clear()
+            self.origin = time.perf_counter()
+
+    def snapshot(self) -> dict:
+        """Counters, per-span aggregates and derived throughput, as plain data."""
+        with self._lock:
+            counters = dict(self.counters)
+            spans = {name: stats.as_dict() for name, stats in self.spans.items()}
+        throughput = {}
+        for counter, span, label in THROUGHPUT:
+            seconds = spans.get(span, {}).get('total', 0.0)
+            if counter in counters and seconds > 0:
+                throughput[f"{counter} ({label})"] = counters[counter] / seconds
+        return {'uptime': time.perf_counter() - self.origin, 'counters': counters,
+                'spans': spans, 'throughput': throughput}
+
+    def chrome_trace(self) -> dict:
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        pid = os.getpid()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': names[tid]}}
+                 for tid in {event[3] for event in events} if tid in names]
+        end = 0.0
+        for name, start, duration, tid, args in events:
+            ts = (start - self.origin) * 1e6
+            end = max(end, ts + duration * 1e6)
+            trace.append({'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                          'ts': ts, 'dur': duration * 1e6, 'args': args})
+        if counters:
+            trace.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'ts': end, 'args': counters})
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def export_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def export_chrome_trace(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary_lines(self) -> List[str]:
+        """Human readable snapshot, for the debug overlay and the CLI."""
+        snap = self.snapshot()
+        lines = [f"{'span':<22}{'n':>7}{'total s':>10}{'last ms':>10}{'max ms':>10}"]
+        for name, s in sorted(snap['spans'].items()):
+            lines.append(f"{name:<22}{s['count']:>7}{s['total']:>10.3f}{s['last'] * 1e3:>10.1f}{s['max'] * 1e3:>10.1f}")
+        lines.append("")
+        for name, value in sorted(snap['counters'].items()):
+            lines.append(f"{name:<32}{value:>14,.0f}")
+        for name, value in sorted(snap['throughput'].items()):
+            lines.append(f"{name:<32}{value:>14,.0f}")
+        return lines
+
+
+metrics = Metrics()
+span = metrics.span
+count = metrics.count
+
+
+class Capture:
+    """Result of a profiling capture: a text report and, optionally, a file."""
+
+    def __init__(self, mode: str, output: Optional[str]):
+        self.mode = mode
+        self.output = output
+        self.report = ""
+
+
+@contextmanager
+def capture(mode: str, output: Optional[str] = None, top: int = 25) -> Iterator[Capture]:
+    """Profile the enclosed block with cProfile or tracemalloc.
+
+    cProfile only sees the calling thread, so wrap the function that runs
+    on the worker (see profiled()) rather than the code that submits it;
+    tracemalloc covers every thread. With `output`, cProfile stats are
+    dumped there for pstats/snakeviz and the tracemalloc report is written
+    as text.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    result = Capture(mode, output)
+    if mode == 'cprofile':
+        import cProfile
+        import io
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(top)
+            result.report = stream.getvalue()
+            if output:
+                profiler.dump_stats(output)
+    else:
+        import tracemalloc
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(10)
+        # Before Python 3.9 the peak can't be reset; if someone else was already
+        # tracing, it may then include allocations from before this block
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        try:
+            yield result
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started:
+                tracemalloc.stop()
+            lines = [f"current {current / 1024:.0f} KiB, peak {peak / 1024:.0f} KiB", ""]
+            lines += [str(stat) for stat in snapshot.statistics('lineno')[:top]]
+            result.report = "\n".join(lines)
+            if output:
+                with open(output, 'w', encoding='utf-8') as f:
+                    f.write(result.report + "\n")
+
+
+def profiled(func: Callable, mode: str, output: Optional[str] = None,
+             on_report: Optional[Callable[[Capture], None]] = None) -> Callable:
+    """Wrap `func` so its call runs under capture(); `on_report` gets the Capture."""
+    def wrapper(*args, **kwargs):
+        result = None
+        try:
+            with capture(mode, output) as result:
+                return func(*args, **kwargs)
+        finally:
+            if on_report is not None and result is not None:
+                on_report(result)
+    return wrapper
@@ -0,0 +1,286 @@
+import fnmatch
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from categories import OTHER, get_category
+
+SIZE_UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400, 'y': 365 * 86400}
+
+# Content signatures for the "magic" predicate: name -> [(offset, bytes), ...]
+MAGIC_SIGNATURES: Dict[str, List[Tuple[int, bytes]]] = {
+    'pdf': [(0, b'%PDF-')],
+    'png': [(0, b'\x89PNG\r\n\x1a\n')],
+    'jpeg': [(0, b'\xff\xd8\xff')],
+    'gif': [(0, b'GIF87a'), (0, b'GIF89a')],
+    'webp': [(8, b'WEBP')],
+    'zip': [(0, b'PK\x03\x04'), (0, b'PK\x05\x06')],
+    'gzip': [(0, b'\x1f\x8b')],
+    '7z': [(0, b"7z\xbc\xaf'\x1c")],
+    'rar': [(0, b'Rar!\x1a\x07')],
+    'mp3': [(0, b'ID3')],
+    'mp4': [(4, b'ftyp')],
+    'wav': [(8, b'WAVE')],
+    'ogg': [(0, b'OggS')],
+    'flac': [(0, b'fLaC')],
+    'exe': [(0, b'MZ')],
+    'elf': [(0, b'\x7fELF')],
+}
+
+MATCH_KEYS = {'ext', 'glob', 'regex', 'min_size', 'max_size', 'older_than', 'newer_than', 'magic'}
+
+
+class RuleError(ValueError):
+    """A rule file could not be parsed or compiled."""
+
+
+def default_rules_path() -> Path:
+    """Where the GUI and CLI look for a rule file by default."""
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or str(Path.home() / "AppData" / "Roaming")
+    elif sys.platform == 'darwin':
+        base = str(Path.home() / "Library" / "Application Support")
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or str(Path.home() / ".config")
+    return Path(base) / "file_organizer" / "rules.json"
+
+
+def parse_size(value) -> int:
+    """Parse 1048576, "1MB" or "1.5 GB" into bytes (binary units)."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?B?)\s*', str(value).upper())
+    if not match:
+        raise RuleError(f"Invalid size: {value!r}")
+    number, unit = match.groups()
+    if unit and not unit.endswith('B'):
+        unit += 'B'
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def parse_duration(value) -> float:
+    """Parse 3600, "12h", "30d" or "1y" into seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([smhdwy])\s*', str(value).lower())
+    if not match:
+        raise RuleError(f"Invalid duration: {value!r}")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+def _strings(key: str, value) -> List[str]:
+    """`value` as a list of strings, for match keys that take one string or several."""
+    values = _as_list(value)
+    if not all(isinstance(v, str) for v in values):
+        raise RuleError(f"'{key}' must be a string or a list of strings")
+    return values
+
+
+def any_pattern(patterns: List[str]) -> Callable[[str], object]:
+    """A case-insensitive search for any of `patterns`.
+
+    Patterns are merged into one alternation where that means the same
+    thing. Patterns with groups are searched on their own: in an
+    alternation their groups would be renumbered (breaking backreferences)
+    and a group name used twice would not compile. Raises re.error.
+    """
+    compiled = [re.compile(p, re.IGNORECASE) for p in patterns]
+    simple = [p for p, c in zip(patterns, compiled) if not c.groups]
+    searches = [c.search for c in compiled if c.groups]
+    if simple:
+        try:
+            searches.insert(0, re.compile('|'.join(f'(?:{p})' for p in simple), re.IGNORECASE).search)
+        except re.error:
+            # e.g. global inline flags, which are only allowed at the start of a pattern
+            searches[:0] = [c.search for c in compiled if not c.groups]
+    if len(searches) == 1:
+        return searches[0]
+    return lambda name: any(search(name) for search in searches)
+
+
+class Rule:
+    """One compiled rule. Predicates left as None always pass."""
+
+    __slots__ = ('index', 'name', 'target', 'exts', 'min_size', 'max_size',
+                 'older_than', 'newer_than', 'name_match', 'name_patterns', 'signatures')
+
+    def __init__(self, index: int, name: str, target: str):
+        self.index = index
+        self.name = name
+        self.target = target
+        self.exts: Optional[Tuple[str, ...]] = None
+        self.min_size: Optional[int] = None
+        self.max_size: Optional[int] = None
+        self.older_than: Optional[float] = None
+        self.newer_than: Optional[float] = None
+        self.name_match: Optional[Callable] = None
+        self.name_patterns: List[str] = []
+        self.signatures: Optional[List[Tuple[int, bytes]]] = None
+
+
+def compile_rule(index: int, spec: dict) -> Rule:
+    if not isinstance(spec, dict) or 'target' not in spec:
+        raise RuleError(f"Rule {index + 1}: every rule needs a 'target'")
+    if not isinstance(spec['target'], str):
+        raise RuleError(f"Rule {index + 1}: 'target' must be a string")
+    target = spec['target'].strip('/\\')
+    if not target or any(part in ('', '.', '..') for part in re.split(r'[/\\]', target)):
+        raise RuleError(f"Rule {index + 1}: invalid target {spec['target']!r}")
+    rule = Rule(index, str(spec.get('name', target)), target)
+    match = spec.get('match', {})
+    if not isinstance(match, dict):
+        raise RuleError(f"Rule {index + 1}: 'match' must be an object")
+    unknown = set(match) - MATCH_KEYS
+    if unknown:
+        raise RuleError(f"Rule {index + 1}: unknown match keys {sorted(unknown)}")
+
+    try:
+        if 'ext' in match:
+            rule.exts = tuple(e.lower() if e.startswith('.') else '.' + e.lower()
+                              for e in _strings('ext', match['ext']))
+        if 'min_size' in match:
+            rule.min_size = parse_size(match['min_size'])
+        if 'max_size' in match:
+            rule.max_size = parse_size(match['max_size'])
+        if 'older_than' in match:
+            rule.older_than = parse_duration(match['older_than'])
+        if 'newer_than' in match:
+            rule.newer_than = parse_duration(match['newer_than'])
+        # Globs are case-insensitive and match the whole name; regexes search anywhere
+        patterns = [r'\A' + fnmatch.translate(glob) for glob in _strings('glob', match.get('glob', []))]
+        patterns += _strings('regex', match.get('regex', []))
+        if patterns:
+            rule.name_patterns = patterns
+            rule.name_match = any_pattern(patterns)
+        if 'magic' in match:
+            rule.signatures = []
+            for kind in _strings('magic', match['magic']):
+                if kind.startswith('hex:'):
+                    rule.signatures.append((0, bytes.fromhex(kind[4:])))
+                elif kind in MAGIC_SIGNATURES:
+                    rule.signatures.extend(MAGIC_SIGNATURES[kind])
+                else:
+                    raise RuleError(f"unknown magic type {kind!r}")
+    except re.error as e:
+        raise RuleError(f"Rule {index + 1}: bad pattern: {e}") from None
+    except (RuleError, ValueError, TypeError) as e:
+        raise RuleError(f"Rule {index + 1}: {e}") from None
+    return rule
+
+
+class RuleSet:
+    """Rules compiled into a matcher; the first matching rule wins.
+
+    To keep classification cheap the work is ordered by cost:
+    - rules are pre-bucketed by the last component of their extensions, so a
+      file only looks at rules that can apply to its extension;
+    - size and age checks come next, then the name patterns, which are also
+      merged (see any_pattern) so one search rules out every pattern rule;
+    - magic bytes are read last, at most once per file, and only as many
+      bytes as the longest signature in use.
+    Files no rule claims fall back to the extension categories.
+    """
+
+    def __init__(self, rules: List[Rule], fallback: Optional[Callable[[str], str]] = get_category,
+                 now: Optional[float] = None):
+        self.rules = rules
+        self.fallback = fallback
+        self.now = time.time() if now is None else now
+
+        unconstrained = [rule for rule in rules if rule.exts is None]
+        buckets: Dict[str, List[Rule]] = {}
+        for rule in rules:
+            for ext in rule.exts or ():
+                buckets.setdefault(ext[ext.rfind('.'):], [])
+        for last in buckets:
+            buckets[last] = [rule for rule in rules
+                             if rule.exts is None or any(ext.endswith(last) for ext in rule.exts)]
+        self._by_ext = buckets
+        self._unconstrained = unconstrained
+
+        patterns = [p for rule in rules for p in rule.name_patterns]
+        try:
+            self._any_name = any_pattern(patterns) if patterns else None
+        except re.error as e:
+            raise RuleError(f"bad pattern: {e}") from None
+        self._header_size = max((offset + len(sig) for rule in rules for offset, sig in rule.signatures or ()),
+                                default=0)
+
+    def top_level_targets(self) -> List[str]:
+        """First path component of every rule target (folders a run may create)."""
+        return sorted({re.split(r'[/\\]', rule.target)[0] for rule in self.rules})
+
+    def classify(self, name: str, path: str, size: int, mtime: float) -> str:
+        """Return the target folder (relative, '/'-separated) for a file."""
+        lname = name.lower()
+        dot = lname.rfind('.')
+        candidates = self._by_ext.get(lname[dot:], self._unconstrained) if dot > 0 else self._unconstrained
+        age = self.now - mtime
+        name_hit = None
+        header = None
+        for rule in candidates:
+            if rule.min_size is not None and size < rule.min_size:
+                continue
+            if rule.max_size is not None and size > rule.max_size:
+                continue
+            if rule.older_than is not None and age < rule.older_than:
+                continue
+            if rule.newer_than is not None and age > rule.newer_than:
+                continue
+            if rule.exts is not None and not lname.endswith(rule.exts):
+                continue
+            if rule.name_match is not None:
+                if name_hit is None:
+                    name_hit = bool(self._any_name(name))
+                if not name_hit or not rule.name_match(name):
+                    continue
+            if rule.signatures is not None:
+                if header is None:
+                    header = _read_header(path, self._header_size)
+                if not any(header.startswith(sig, offset) for offset, sig in rule.signatures):
+                    continue
+            return rule.target
+        return self.fallback(name) if self.fallback is not None else OTHER
+
+
+def _read_header(path: str, size: int) -> bytes:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(size)
+    except OSError:
+        return b''
+
+
+def compile_rules(config: dict, fallback: Optional[Callable[[str], str]] = get_category) -> RuleSet:
+    """Compile a parsed rule file: {"rules": [...], "fallback": "extension" | "none"}."""
+    if not isinstance(config, dict) or not isinstance(config.get('rules'), list):
+        raise RuleError("A rule file needs a top-level 'rules' list")
+    if config.get('fallback', 'extension') == 'none':
+        fallback = None
+    return RuleSet([compile_rule(i, spec) for i, spec in enumerate(config['rules'])], fallback)
+
+
+def load_rules(path: str) -> RuleSet:
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+    except ValueError as e:
+        raise RuleError(f"{path}: {e}") from None
+    return compile_rules(config)
+
+
+def load_default_rules() -> Optional[RuleSet]:
+    """The user's rule file, or None if there isn't one."""
+    path = default_rules_path()
+    if not path.is_file():
+        return None
+    return load_rules(str(path))
@@ -0,0 +1,209 @@
+import os
+import queue
+import stat
+import sys
+import threading
+import time
+from typing import Iterator, List, Optional
+
+from perf import metrics
+
+
+class FileRecord:
+    """Compact, slot-based description of a single directory entry."""
+
+    __slots__ = ('name', 'path', 'size', 'modified', 'is_dir')
+
+    def __init__(self, name: str, path: str, size: int, modified: float, is_dir: bool):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.modified = modified
+        self.is_dir = is_dir
+
+    def __repr__(self) -> str:
+        kind = 'dir' if self.is_dir else 'file'
+        return f"FileRecord({self.name!r}, {kind}, size={self.size})"
+
+    def as_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def record_from_entry(entry: os.DirEntry) -> FileRecord:
+    """Build a record from a DirEntry using its cached stat result.
+
+    The type comes from ``st_mode`` so only one stat call is made per entry
+    (none at all on Windows, where scandir already carries the stat data).
+    """
+    st = entry.stat()
+    return FileRecord(entry.name, entry.path, st.st_size, st.st_mtime, stat.S_ISDIR(st.st_mode))
+
+
+def record_from_path(path: str) -> Optional[FileRecord]:
+    """Build a record for a single path, or None if it cannot be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return FileRecord(os.path.basename(path), path, st.st_size, st.st_mtime, stat.S_ISDIR(st.st_mode))
+
+
+def scan_directory(directory: str) -> List[FileRecord]:
+    """List a directory in a single os.scandir pass."""
+    records = []
+    with metrics.span("scan", directory=directory), os.scandir(directory) as it:
+        for entry in it:
+            try:
+                records.append(record_from_entry(entry))
+            except OSError as e:
+                print(f"Error getting file info for {entry.path}: {e}")
+    metrics.count("syscalls.scandir")
+    metrics.count("syscalls.stat", len(records))
+    metrics.count("scan.entries", len(records))
+    return records
+
+
+def iter_scan_batches(directory: str, batch_size: int,
+                      cancelled: Optional[threading.Event] = None) -> Iterator[List[FileRecord]]:
+    """Scan a directory, yielding records in batches of up to `batch_size`.
+
+    Stops early, without yielding the partial batch, once `cancelled` is set.
+    """
+    batch = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if cancelled is not None and cancelled.is_set():
+                return
+            try:
+                batch.append(record_from_entry(entry))
+            except OSError as e:
+                print(f"Error getting file info for {entry.path}: {e}")
+                continue
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+class ScanJob:
+    """A single directory scan running on a worker thread.
+
+    Batches are handed over through a queue so the render thread can pick
+    them up with drain() without ever blocking on disk I/O.
+    """
+
+    def __init__(self, directory: str, batch_size: int, cache=None, use_cache: bool = True):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.cache = cache
+        self.use_cache = use_cache
+        self.from_cache = False
+        self.batches: "queue.Queue[List[FileRecord]]" = queue.Queue()
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.error: Optional[Exception] = None
+        self.scanned = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def run(self):
+        try:
+            dir_stat = None
+            if self.cache is not None:
+                dir_stat = os.stat(self.directory)
+                if self.use_cache and self._emit_cached(dir_stat):
+                    return
+            records = []
+            metrics.count("syscalls.scandir")
+            for batch in iter_scan_batches(self.directory, self.batch_size, self.cancelled):
+                self.scanned += len(batch)
+                self.batches.put(batch)
+                metrics.count("syscalls.stat", len(batch))
+                metrics.count("scan.entries", len(batch))
+                if dir_stat is not None:
+                    records.extend(batch)
+            if dir_stat is not None and not self.cancelled.is_set():
+                try:
+                    self.cache.put(self.directory, records, dir_stat)
+                except Exception as e:
+                    print(f"Error caching listing of {self.directory}: {e}")
+        except Exception as e:
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - self.started
+            metrics.add_span("scan.cached" if self.from_cache else "scan", self.started, self.elapsed,
+                             directory=self.directory, entries=self.scanned)
+            self.finished.set()
+
+    def _emit_cached(self, dir_stat: os.stat_result) -> bool:
+        """Queue the cached listing if there is a valid one; return whether it was used."""
+        try:
+            records = self.cache.get(self.directory, dir_stat)
+        except Exception as e:
+            print(f"Error reading listing cache for {self.directory}: {e}")
+            return False
+        if records is None:
+            metrics.count("cache.misses")
+            return False
+        metrics.count("cache.hits")
+        self.from_cache = True
+        for i in range(0, len(records), self.batch_size):
+            batch = records[i:i + self.batch_size]
+            self.scanned += len(batch)
+            self.batches.put(batch)
+        return True
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def drain(self) -> List[FileRecord]:
+        """Return every record queued since the last call."""
+        records = []
+        while True:
+            try:
+                records.extend(self.batches.get_nowait())
+            except queue.Empty:
+                return records
+
+    @property
+    def done(self) -> bool:
+        """True once the worker has finished and every batch was drained."""
+        return self.finished.is_set() and self.batches.empty()
+
+
+class BackgroundScanner:
+    """Runs directory scans on a small thread pool, one live scan at a time.
+
+    If a ListingCache is given, unchanged directories are served from it
+    and every completed scan is written back to it.
+    """
+
+    def __init__(self, workers: int = 2, batch_size: int = 2000, cache=None):
+        self.batch_size = batch_size
+        self.cache = cache
+        # Imported here so plain scan_directory() users don't pay for it
+        from concurrent.futures import ThreadPoolExecutor
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+        self.current: Optional[ScanJob] = None
+
+    def start(self, directory: str, use_cache: bool = True) -> ScanJob:
+        """Start scanning `directory`, cancelling any scan still in flight.
+
+        With `use_cache` false the listing cache is refreshed but not read.
+        """
+        if self.current is not None:
+            self.current.cancel()
+        job = ScanJob(directory, self.batch_size, self.cache, use_cache)
+        self.current = job
+        self.executor.submit(job.run)
+        return job
+
+    def shutdown(self):
+        if self.current is not None:
+            self.current.cancel()
+        if sys.version_info >= (3, 9):
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            # Queued scans still start, but see their job cancelled and return at once
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,201 @@
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from categories import category_index
+from scanner import FileRecord
+
+MB = 1024 * 1024
+DAY = 86400
+
+# Facet label -> (min, max) bounds; None means unbounded
+SIZE_FACETS: Dict[str, Optional[Tuple[Optional[int], Optional[int]]]] = {
+    "Any size": None,
+    "Under 1 MB": (None, MB),
+    "1 - 100 MB": (MB, 100 * MB),
+    "Over 100 MB": (100 * MB, None),
+}
+# Facet label -> (min age, max age) in seconds
+DATE_FACETS: Dict[str, Optional[Tuple[Optional[float], Optional[float]]]] = {
+    "Any time": None,
+    "Today": (None, DAY),
+    "Last 7 days": (None, 7 * DAY),
+    "Last 30 days": (None, 30 * DAY),
+    "Last year": (None, 365 * DAY),
+    "Older than a year": (365 * DAY, None),
+}
+ANY_CATEGORY = "All categories"
+
+
+INDEX_BUDGET = 0.004  # Seconds of trigram indexing per catch_up() call (one frame)
+
+
+def _trigrams(name: str) -> Set[str]:
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+
+class SearchIndex:
+    """Trigram index over the lowercased names of a listing.
+
+    A query is split into terms that must all occur in the name. Terms of
+    three or more characters are answered from the posting lists (shortest
+    lists intersected first) and the candidates are then checked with a
+    plain substring test, so results are exact. The previous result is
+    kept: typing more characters only re-checks the names that matched
+    before.
+
+    Building postings costs about as much as scanning every name a hundred
+    times, so it is done incrementally: catch_up() indexes for a bounded
+    time slice per call (the GUI calls it once per frame), and until the
+    index covers the whole listing, the not yet indexed tail is simply
+    scanned. Records appended to the same list are indexed incrementally.
+    """
+
+    def __init__(self):
+        self.records: List[FileRecord] = []
+        self._names: List[str] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._indexed = 0
+        self._last_text = ""
+        self._last_result: Optional[List[int]] = None
+
+    @property
+    def complete(self) -> bool:
+        return self._indexed == len(self.records)
+
+    def sync(self, records: List[FileRecord]):
+        """Track `records`, keeping the work done for the same list before."""
+        if records is not self.records or len(records) < len(self._names):
+            self.records = records
+            self._names = []
+            self._postings = {}
+            self._indexed = 0
+        elif len(records) == len(self._names):
+            return
+        self._last_text = ""
+        self._last_result = None
+        self._names.extend(record.name.lower() for record in records[len(self._names):])
+
+    def catch_up(self, budget: float = INDEX_BUDGET) -> bool:
+        """Index names for up to `budget` seconds; returns True once complete."""
+        names = self._names
+        postings = self._postings
+        deadline = time.perf_counter() + budget
+        index = self._indexed
+        total = len(names)
+        while index < total:
+            stop = min(total, index + 256)
+            for i in range(index, stop):
+                for gram in _trigrams(names[i]):
+                    posting = postings.get(gram)
+                    if posting is None:
+                        postings[gram] = [i]
+                    else:
+                        posting.append(i)
+            index = stop
+            if time.perf_counter() >= deadline:
+                break
+        self._indexed = index
+        return index == total
+
+    def search(self, text: str) -> Optional[List[int]]:
+        """Indices (ascending) of the records whose name contains every term of `text`.
+
+        Returns None for an empty query (everything matches).
+        """
+        text = text.lower().strip()
+        if not text:
+            return None
+        terms = text.split()
+        names = self._names
+
+        if self._last_result is not None and self._last_text and text.startswith(self._last_text):
+            # Every old term is part of a new one, so new matches are a subset of the old
+            candidates: Iterable[int] = self._last_result
+        else:
+            grams = set()
+            for term in terms:
+                grams |= _trigrams(term)
+            if grams and self._indexed:
+                lists = sorted((self._postings.get(gram, ()) for gram in grams), key=len)
+                found = set(lists[0])
+                for posting in lists[1:]:
+                    if not found:
+                        break
+                    found.intersection_update(posting)
+                candidates = sorted(found)
+                if self._indexed < len(names):
+                    candidates.extend(range(self._indexed, len(names)))
+            else:
+                candidates = range(len(names))
+
+        # Longest term first: it is the most selective
+        for term in sorted(terms, key=len, reverse=True):
+            candidates = [i for i in candidates if term in names[i]]
+        self._last_text = text
+        self._last_result = candidates
+        return candidates
+
+
+class FileFilter:
+    """Name query plus category, size and date facets over a FileModel.
+
+    apply() keeps the model's sort order and returns only matching records.
+    """
+
+    def __init__(self):
+        self.index = SearchIndex()
+        self.text = ""
+        self.category = ANY_CATEGORY
+        self.size = "Any size"
+        self.date = "Any time"
+        self._categories: List[Optional[str]] = []
+        self._categories_for: Optional[List[FileRecord]] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.text.strip()) or self.category != ANY_CATEGORY or \
+            SIZE_FACETS[self.size] is not None or DATE_FACETS[self.date] is not None
+
+    def _category_list(self, records: List[FileRecord]) -> List[Optional[str]]:
+        """Category per record (None for folders), computed once per listing."""
+        if self._categories_for is not records or len(self._categories) > len(records):
+            self._categories_for = records
+            self._categories = []
+        if len(self._categories) < len(records):
+            lookup = category_index().category
+            self._categories.extend(None if r.is_dir else lookup(r.name)
+                                    for r in records[len(self._categories):])
+        return self._categories
+
+    def apply(self, records: List[FileRecord], order: List[int]) -> List[FileRecord]:
+        """The records at `order` (a sort permutation) that pass the filter."""
+        if not self.active:
+            return [records[i] for i in order]
+
+        candidates = order
+        if self.text.strip():
+            self.index.sync(records)
+            matches = self.index.search(self.text)
+            if not matches:
+                return []
+            if len(matches) < len(order):
+                matched = set(matches)
+                candidates = [i for i in order if i in matched]
+
+        # Each facet narrows the candidates in one pass, in sort order
+        if self.category != ANY_CATEGORY:
+            categories = self._category_list(records)
+            wanted = self.category
+            candidates = [i for i in candidates if categories[i] == wanted]
+        size_range = SIZE_FACETS[self.size]
+        if size_range is not None:
+            low = size_range[0] or 0
+            high = size_range[1] if size_range[1] is not None else float('inf')
+            candidates = [i for i in candidates if not records[i].is_dir and low <= records[i].size < high]
+        age_range = DATE_FACETS[self.date]
+        if age_range is not None:
+            now = time.time()
+            oldest = now - age_range[1] if age_range[1] is not None else float('-inf')
+            newest = now - age_range[0] if age_range[0] is not None else float('inf')
+            candidates = [i for i in candidates if oldest <= records[i].modified < newest]
+        return [records[i] for i in candidates]
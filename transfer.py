@@ -0,0 +1,174 @@
+import errno
+import hashlib
+import itertools
+import os
+import shutil
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from perf import metrics
+
+DEFAULT_TRANSFERS = 4            # Concurrent cross-device copies; more mostly adds seeking
+COPY_CHUNK = 64 * 1024 * 1024    # Bytes per copy_file_range/sendfile call
+BUFFER_SIZE = 8 * 1024 * 1024    # Read buffer when copying through user space
+# Errors meaning "this kernel/filesystem can't do that", not "the copy failed"
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM,
+                getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP)}
+_temp_ids = itertools.count()  # next() on a count is atomic, so threads never share a temp name
+
+
+class TransferError(OSError):
+    """A copy did not match its source; the source was left in place."""
+
+
+class TransferMonitor:
+    """Byte progress of cross-device copies, shared between workers and the UI.
+
+    Workers update it from their threads; the UI polls snapshot() instead
+    of receiving callbacks, the same way scans and organize runs report.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.files_done = 0
+        self._active: Dict[str, List[int]] = {}
+
+    def expect(self, size: int):
+        """Announce bytes that will be copied, so the total is known early."""
+        with self._lock:
+            self.bytes_total += size
+
+    def start(self, path: str, size: int):
+        with self._lock:
+            self._active[path] = [0, size]
+
+    def advance(self, path: str, n: int):
+        with self._lock:
+            self._active[path][0] += n
+            self.bytes_done += n
+
+    def finish(self, path: str):
+        with self._lock:
+            done, size = self._active.pop(path)
+            # Sources that changed size since planning must not skew the totals
+            self.bytes_done += size - done
+            self.files_done += 1
+
+    def snapshot(self) -> Tuple[int, int, List[Tuple[str, int, int]]]:
+        """(bytes done, bytes total, [(path, done, size)] for copies in flight)."""
+        with self._lock:
+            active = [(path, done, size) for path, (done, size) in self._active.items()]
+            return self.bytes_done, max(self.bytes_total, self.bytes_done), active
+
+
+def _fast_copy(infd: int, outfd: int, report: Callable[[int], None]) -> bool:
+    """Copy in the kernel; False if neither copy_file_range nor sendfile works here.
+
+    Both calls advance the file positions, so a fallback picks up where a
+    partial attempt stopped.
+    """
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while True:
+                n = os.copy_file_range(infd, outfd, COPY_CHUNK)
+                if not n:
+                    return True
+                report(n)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+    if sys.platform.startswith('linux'):
+        try:
+            while True:
+                n = os.sendfile(outfd, infd, None, COPY_CHUNK)
+                if not n:
+                    return True
+                report(n)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+    return False
+
+
+def _buffered_copy(fin, fout, report: Callable[[int], None], digest=None):
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    while True:
+        n = fin.readinto(buffer)
+        if not n:
+            return
+        written = 0
+        while written < n:  # Unbuffered writes may be partial
+            written += fout.write(view[written:n])
+        if digest is not None:
+            digest.update(view[:n])
+        report(n)
+
+
+def _hash_file(path: str) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                return h.digest()
+            h.update(view[:n])
+
+
+def move_file(source: str, target: str, verify: bool = False,
+              monitor: Optional[TransferMonitor] = None):
+    """Move a file to another filesystem: copy, flush, optionally verify, then delete.
+
+    The data goes to a temporary name next to `target` and is only renamed
+    into place once it is complete and on disk, so a crash never leaves a
+    truncated file under the real name and the source is only deleted
+    after that. The copy runs in the kernel (copy_file_range, then
+    sendfile) where possible. With `verify`, data is copied through a
+    buffer while hashing the source, and the written file is read back
+    and compared before the source is removed.
+    """
+    if os.path.islink(source):
+        shutil.move(source, target)
+        return
+    # A short fixed-size name: suffixing the target could push it past NAME_MAX
+    temp = os.path.join(os.path.dirname(target), f".part-{os.getpid()}-{next(_temp_ids)}")
+    if monitor is not None:
+        monitor.start(source, os.path.getsize(source))
+        report = lambda n: monitor.advance(source, n)  # noqa: E731
+    else:
+        report = lambda n: None  # noqa: E731
+
+    with metrics.span("transfer", source=source):
+        try:
+            with open(source, 'rb', buffering=0) as fin, open(temp, 'xb', buffering=0) as fout:
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(fin.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                digest = None
+                if verify:
+                    digest = hashlib.blake2b(digest_size=16)
+                    _buffered_copy(fin, fout, report, digest)
+                elif not _fast_copy(fin.fileno(), fout.fileno(), report):
+                    _buffered_copy(fin, fout, report)
+                os.fsync(fout.fileno())
+                copied = fout.tell()
+            shutil.copystat(source, temp)
+            if digest is not None and _hash_file(temp) != digest.digest():
+                raise TransferError(errno.EIO, f"Copy of {source} does not match the original")
+            os.replace(temp, target)
+        except BaseException:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            raise
+        finally:
+            if monitor is not None:
+                monitor.finish(source)
+    os.remove(source)
+    metrics.count("transfer.files")
+    metrics.count("transfer.bytes", copied)
@@ -0,0 +1,138 @@
+import fnmatch
+import os
+import re
+import threading
+from collections import deque
+from typing import Callable, Deque, Iterable, List, Optional, Tuple
+
+from perf import metrics
+from scanner import FileRecord
+
+DEFAULT_WALKERS = min(16, (os.cpu_count() or 1) * 2)
+
+
+def make_skip_rule(exclude: Iterable[str] = (), skip_hidden: bool = True) -> Callable[[str], bool]:
+    """Build a predicate telling whether an entry name should be skipped.
+
+    `exclude` holds fnmatch-style patterns matched against entry names.
+    """
+    matchers = [re.compile(fnmatch.translate(pattern)).match for pattern in exclude]
+
+    def skip(name: str) -> bool:
+        if skip_hidden and name.startswith('.'):
+            return True
+        return any(match(name) for match in matchers)
+
+    return skip
+
+
+def walk_files(root: str, max_depth: Optional[int] = None,
+               skip: Optional[Callable[[str], bool]] = None,
+               skip_root_dirs: Iterable[str] = (),
+               workers: int = DEFAULT_WALKERS) -> List[FileRecord]:
+    """Collect every file below `root` using a work-stealing pool of scanners.
+
+    Each worker owns a deque of directories: it pushes subdirectories it
+    finds onto its own end and pops from there (depth first, cache
+    friendly), while idle workers steal from the other end of someone
+    else's deque. scandir and stat release the GIL, so the pool overlaps
+    directory I/O even though the bookkeeping is single-threaded Python.
+    Workers with nothing to steal sleep on a condition until new
+    directories are queued, so a narrow tree does not burn CPU spinning.
+
+    `max_depth` counts levels below `root` (0 means only root itself).
+    Directories named in `skip_root_dirs` are not entered at the top level,
+    and symlinked directories are never followed.
+    """
+    skip = skip or (lambda name: False)
+    root_skips = set(skip_root_dirs)
+    workers = max(1, workers)
+    deques: List[Deque[Tuple[str, int]]] = [deque() for _ in range(workers)]
+    results: List[List[FileRecord]] = [[] for _ in range(workers)]
+    scanned = [0] * workers  # Directories listed per worker, summed once at the end
+    errors: List[Tuple[str, OSError]] = []
+    work = threading.Condition()  # Guards pending and idle; notified when directories are queued
+    done = threading.Event()
+    pending = 1  # Directories queued or being scanned
+    idle = 0     # Workers waiting on `work`
+    deques[0].append((root, 0))
+
+    def steal(me: int) -> Optional[Tuple[str, int]]:
+        for offset in range(1, workers):
+            try:
+                return deques[(me + offset) % workers].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def scan(me: int, path: str, depth: int):
+        nonlocal pending
+        subdirs = []
+        files = results[me]
+        scanned[me] += 1
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    name = entry.name
+                    if skip(name):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if max_depth is not None and depth >= max_depth:
+                                continue
+                            if depth == 0 and name in root_skips:
+                                continue
+                            subdirs.append((entry.path, depth + 1))
+                        elif entry.is_file():
+                            st = entry.stat()
+                            files.append(FileRecord(name, entry.path, st.st_size, st.st_mtime, False))
+                    except OSError as e:
+                        errors.append((entry.path, e))
+        except OSError as e:
+            errors.append((path, e))
+        with work:
+            # Count new work before it becomes visible so pending never drops to 0 early
+            pending += len(subdirs) - 1
+            deques[me].extend(subdirs)
+            if pending == 0:
+                done.set()
+                work.notify_all()
+            elif len(subdirs) > 1 and idle:
+                # This worker pops one of them next; wake others only for the rest
+                work.notify(len(subdirs) - 1)
+
+    def run(me: int):
+        nonlocal idle
+        own = deques[me]
+        while True:
+            try:
+                task = own.pop()
+            except IndexError:
+                task = steal(me)
+                if task is None:
+                    with work:
+                        # Directories are queued under `work`, so none can slip in unseen
+                        while not done.is_set() and not any(deques):
+                            idle += 1
+                            work.wait()
+                            idle -= 1
+                    if done.is_set():
+                        return
+                    continue
+            scan(me, *task)
+
+    threads = [threading.Thread(target=run, args=(i,), name=f"walk-{i}", daemon=True)
+               for i in range(workers)]
+    with metrics.span("walk", root=root, workers=workers):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for path, e in errors:
+        print(f"Error scanning {path}: {e}")
+    records = [record for chunk in results for record in chunk]
+    metrics.count("syscalls.scandir", sum(scanned))
+    metrics.count("syscalls.stat", len(records))
+    metrics.count("walk.files", len(records))
+    return records